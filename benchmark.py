@@ -0,0 +1,250 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from preprocessing import IMAGE_EXTENSIONS, BatchBuffer, decode_into
+
+CORPUS_DIR = 'food_images'
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def corpus_paths(folder=CORPUS_DIR):
+    return sorted(os.path.join(folder, file) for file in os.listdir(folder) if file.lower().endswith(IMAGE_EXTENSIONS))
+
+
+# Ringkasan latensi (ms) + throughput (item/detik) dari daftar durasi per panggilan
+def summarize(durations, items_per_call=1):
+    durations = np.asarray(durations, dtype=np.float64)
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1000
+    return {
+        'calls': int(len(durations)),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(durations.mean() * 1000),
+        'throughput_per_s': float(items_per_call * len(durations) / durations.sum()) if durations.sum() else 0.0,
+    }
+
+
+def _timed(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _batches(paths, batch_size):
+    # Ulangi korpus jika batch lebih besar dari jumlah gambar
+    repeated = paths * (batch_size // len(paths) + 1)
+    return [repeated[i:i + batch_size] for i in range(0, len(repeated) - batch_size + 1, batch_size)]
+
+
+def bench_decode(paths, batch_sizes, thread_counts, repeats):
+    results = []
+    for threads in thread_counts:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for batch_size in batch_sizes:
+                buffer = BatchBuffer(batch_size)
+                batches = itertools.cycle(_batches(paths, batch_size))
+
+                def run():
+                    batch = next(batches)
+                    list(pool.map(lambda i: decode_into(batch[i], buffer.array[i]), range(len(batch))))
+
+                durations = _timed(run, repeats)
+                results.append(dict(summarize(durations, batch_size), stage='decode', batch_size=batch_size,
+                                    threads=threads))
+    return results
+
+
+def _load_backend(name, threads):
+    if name == 'keras':
+        import tensorflow as tf
+        from tflite_backend import KERAS_MODEL_PATH
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        return tf.keras.models.load_model(KERAS_MODEL_PATH)
+    if name == 'tflite':
+        from tflite_backend import TFLITE_MODEL_PATH, TFLiteModel
+        return TFLiteModel(TFLITE_MODEL_PATH, num_threads=threads)
+    raise ValueError(f"Backend tidak dikenal: {name}")
+
+
+def bench_predict(paths, backends, batch_sizes, thread_counts, repeats):
+    results = []
+    images = BatchBuffer(max(batch_sizes)).load(_batches(paths, max(batch_sizes))[0])
+    for backend in backends:
+        # Jumlah thread TensorFlow hanya bisa diatur sekali per proses, jadi Keras memakai nilai pertama
+        for threads in (thread_counts[:1] if backend == 'keras' else thread_counts):
+            try:
+                model = _load_backend(backend, threads)
+            except Exception as e:
+                results.append({'stage': 'predict', 'backend': backend, 'threads': threads, 'error': str(e)})
+                break
+            for batch_size in batch_sizes:
+                batch = images[:batch_size]
+                durations = _timed(lambda: model.predict_on_batch(batch), repeats)
+                results.append(dict(summarize(durations, batch_size), stage='predict', backend=backend,
+                                    batch_size=batch_size, threads=threads))
+    return results
+
+
+# Backend "stub" (default) atau snapshot JSON supaya hasil bisa diulang tanpa API; database
+# SQLite dibuat di folder sementara sehingga nutrition_cache.db milik aplikasi tidak tersentuh
+def bench_nutrition(paths, repeats, backend='stub'):
+    from nutrition import NutritionError, NutritionStore, make_backend
+
+    foods = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    durations = []
+    errors = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = NutritionStore(make_backend(backend), db_path=os.path.join(tmp_dir, 'nutrition_cache.db'))
+        try:
+            for i in range(repeats):
+                start = time.perf_counter()
+                try:
+                    store.get(foods[i % len(foods)])
+                except NutritionError:
+                    errors += 1
+                durations.append(time.perf_counter() - start)
+        finally:
+            store.close()
+    return [dict(summarize(durations), stage='nutrition', backend=backend, errors=errors)]
+
+
+def bench_chatbot(repeats, backend):
+    from chatbot import make_chat_client
+
+    client = make_chat_client(backend)
+    totals, first_tokens = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        first = None
+        for _chunk in client.stream("Apakah pizza sehat?"):
+            if first is None:
+                first = time.perf_counter() - start
+        totals.append(time.perf_counter() - start)
+        first_tokens.append(first if first is not None else totals[-1])
+    return [dict(summarize(totals), stage='chatbot', backend=backend),
+            dict(summarize(first_tokens), stage='chatbot_first_token', backend=backend)]
+
+
+def bench_search(repeats, k=5):
+    from embedding_index import load_index
+
+    index = load_index()
+    if index is None:
+        return [{'stage': 'search', 'error': 'indeks embedding belum dibuat'}]
+    rng = np.random.default_rng(0)
+    queries = itertools.cycle(np.asarray(index.embeddings[rng.integers(len(index), size=repeats)], dtype=np.float32))
+    durations = _timed(lambda: index.search(next(queries), k), repeats)
+    return [dict(summarize(durations), stage='search', index_size=len(index), ivf=index.centroids is not None)]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(stages, backends, batch_sizes, thread_counts, repeats, chat_backend, corpus=CORPUS_DIR,
+        nutrition_backend='stub'):
+    paths = corpus_paths(corpus)
+    results = []
+    if 'decode' in stages:
+        results += bench_decode(paths, batch_sizes, thread_counts, repeats)
+    if 'predict' in stages:
+        results += bench_predict(paths, backends, batch_sizes, thread_counts, repeats)
+    if 'nutrition' in stages:
+        results += bench_nutrition(paths, repeats, nutrition_backend)
+    if 'chatbot' in stages:
+        results += bench_chatbot(max(1, repeats // 10), chat_backend)
+    if 'search' in stages:
+        results += bench_search(repeats)
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.time(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'corpus': corpus,
+        'corpus_size': len(paths),
+        'results': results,
+    }
+
+
+def _result_key(result):
+    return tuple((name, result.get(name)) for name in ('stage', 'backend', 'batch_size', 'threads'))
+
+
+# Bandingkan dua file hasil: perubahan p50/p95 per konfigurasi
+def compare(baseline_path, candidate_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {_result_key(r): r for r in json.load(f)['results'] if 'p50_ms' in r}
+    with open(candidate_path, encoding='utf-8') as f:
+        candidate = {_result_key(r): r for r in json.load(f)['results'] if 'p50_ms' in r}
+    rows = []
+    for key in sorted(set(baseline) & set(candidate), key=str):
+        old, new = baseline[key], candidate[key]
+        label = " ".join(f"{name}={value}" for name, value in key if value is not None)
+        change = (new['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+        rows.append((label, old['p50_ms'], new['p50_ms'], change, old['p95_ms'], new['p95_ms']))
+    return rows
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',') if x]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark latensi klasifikasi makanan pada korpus food_images/")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Jalankan benchmark dan simpan hasil ke JSON")
+    run_parser.add_argument("--stages", default="decode,predict,nutrition,chatbot,search")
+    run_parser.add_argument("--backends", default="keras,tflite")
+    run_parser.add_argument("--batch-sizes", type=_int_list, default=list(BATCH_SIZES))
+    run_parser.add_argument("--threads", type=_int_list,
+                            default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    run_parser.add_argument("--repeats", type=int, default=20)
+    run_parser.add_argument("--chat-backend", default="stub")
+    run_parser.add_argument("--nutrition-backend", default="stub",
+                            help="stub, file snapshot JSON (python nutrition.py export), atau api")
+    run_parser.add_argument("--corpus", default=CORPUS_DIR)
+    run_parser.add_argument("--output", default="benchmark_results.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Bandingkan dua file hasil benchmark")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = run(args.stages.split(','), args.backends.split(','), args.batch_sizes, args.threads,
+                     args.repeats, args.chat_backend, args.corpus, args.nutrition_backend)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        for result in report['results']:
+            label = " ".join(f"{name}={result[name]}" for name in ('stage', 'backend', 'batch_size', 'threads')
+                             if name in result)
+            if 'error' in result:
+                print(f"{label}: gagal ({result['error']})")
+            else:
+                print(f"{label}: p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                      f"p99={result['p99_ms']:.2f}ms {result['throughput_per_s']:.1f}/s")
+        print(f"Hasil disimpan di {args.output}")
+    else:
+        for label, old_p50, new_p50, change, old_p95, new_p95 in compare(args.baseline, args.candidate):
+            print(f"{label}: p50 {old_p50:.2f} -> {new_p50:.2f}ms ({change:+.1f}%), p95 {old_p95:.2f} -> {new_p95:.2f}ms")
@@ -0,0 +1,84 @@
+import io
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from embedding_index import split_prediction
+from prediction_cache import hash_image_bytes, top_k
+from preprocessing import IMAGE_EXTENSIONS, preprocess_image
+
+BULK_MAX_IMAGES = int(os.getenv("BULK_MAX_IMAGES", "500"))
+BULK_DECODE_WORKERS = int(os.getenv("BULK_DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+
+# Ubah daftar file unggahan (gambar dan/atau zip) menjadi pasangan (nama, bytes)
+def iter_uploaded_images(uploaded_files, max_images=BULK_MAX_IMAGES):
+    count = 0
+    for uploaded in uploaded_files:
+        name = uploaded.name
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(uploaded.getvalue())) as archive:
+                for info in archive.infolist():
+                    entry = info.filename
+                    if info.is_dir() or entry.startswith('__MACOSX/') or not entry.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if count >= max_images:
+                        return
+                    count += 1
+                    yield f"{name}/{entry}", archive.read(info)
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            if count >= max_images:
+                return
+            count += 1
+            yield name, uploaded.getvalue()
+
+
+def _decode(data):
+    return preprocess_image(io.BytesIO(data))
+
+
+# Klasifikasi banyak gambar sekaligus. Decode + resize berjalan paralel di thread pool,
+# lalu setiap gambar langsung dikirim ke InferenceEngine yang menggabungkannya menjadi batch.
+# Gambar yang sedang diproses (decode atau menunggu prediksi) dibatasi `max_workers * 2`;
+# gambar berikutnya baru di-decode saat hasil sebelumnya keluar, sehingga memori tidak
+# menampung semua array hasil decode sekaligus (500 gambar ~ 300 MB).
+# Hasil di-yield begitu selesai: (nama, {'top_k', 'embedding'}, None) atau (nama, None, pesan error).
+def classify_images(items, engine, cache=None, max_workers=BULK_DECODE_WORKERS):
+    items = iter(items)
+    max_in_flight = max_workers * 2
+    meta = {}
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            for name, data in items:
+                digest = hash_image_bytes(data)
+                cached = cache.get(digest) if cache is not None else None
+                if cached is not None:
+                    yield name, cached, None
+                    continue
+                future = pool.submit(_decode, data)
+                meta[future] = ('decode', name, digest)
+                pending.add(future)
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, name, digest = meta.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield name, None, str(e)
+                    continue
+                if stage == 'decode':
+                    prediction_future = engine.submit(result)
+                    meta[prediction_future] = ('predict', name, digest)
+                    pending.add(prediction_future)
+                    continue
+                probabilities, embedding = split_prediction(result)
+                if cache is not None:
+                    yield name, cache.put(digest, probabilities, embedding), None
+                else:
+                    yield name, {'top_k': top_k(probabilities), 'embedding': embedding}, None
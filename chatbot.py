@@ -0,0 +1,192 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "gemini")  # "gemini" atau "stub"
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", str(24 * 3600)))  # detik
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "256"))
+
+# Naikkan setiap kali isi prompt diubah supaya jawaban lama di cache tidak dipakai lagi
+PROMPT_TEMPLATE_VERSION = "1"
+
+
+def build_prompt(food, porsi, skor, user_q):
+    gizi = skor['nutrients']
+    batas = skor['limits']
+
+    # Buat baris gizi dinamis
+    gizi_lines = []
+    if gizi['fat_total_g']: gizi_lines.append(f"- Lemak total: {gizi['fat_total_g']:.2f} g")
+    if gizi['fat_saturated_g']: gizi_lines.append(f"- Lemak jenuh: {gizi['fat_saturated_g']:.2f} g")
+    if gizi['sodium_mg']: gizi_lines.append(f"- Natrium: {gizi['sodium_mg']:.2f} mg")
+    if gizi['potassium_mg']: gizi_lines.append(f"- Kalium: {gizi['potassium_mg']:.2f} mg")
+    if gizi['cholesterol_mg']: gizi_lines.append(f"- Kolesterol: {gizi['cholesterol_mg']:.2f} mg")
+    if gizi['carbohydrates_total_g']: gizi_lines.append(f"- Karbohidrat: {gizi['carbohydrates_total_g']:.2f} g")
+    if gizi['fiber_g']: gizi_lines.append(f"- Serat: {gizi['fiber_g']:.2f} g")
+    if gizi['sugar_g']: gizi_lines.append(f"- Gula: {gizi['sugar_g']:.2f} g")
+
+    batas_lines = [
+        f"- Lemak total < {batas['fat_total_g']:.2f} g",
+        f"- Lemak jenuh < {batas['fat_saturated_g']:.2f} g",
+        f"- Natrium < {batas['sodium_mg']:.2f} mg",
+        f"- Kolesterol < {batas['cholesterol_mg']:.2f} mg",
+        f"- Gula < {batas['sugar_g']:.2f} g"
+    ]
+
+    catatan_pedoman = f"""
+    Catatan Referensi Gizi:
+    - Pedoman Kalori (HaloDoc): Asupan kalori harian standar adalah 2000 kkal.
+    - WHO:
+    - Lemak total: Maks. 30% dari kalori harian (≈ 66.7g)
+    - Lemak jenuh: Maks. 10% dari kalori harian (≈ 22.2g)
+    - Gula: Maks. 10% dari kalori harian (≈ 50g)
+    - Natrium: Maks. 2g (2000 mg) per hari
+    - AHA:
+    - Kolesterol: Maks. 300 mg per hari dan untuk yang mengidap penyakit jantung Maks. 200 mg per hari
+    - UCSF:
+    - Serat: 25–30g per hari
+    - AHA:
+    - Karbohidrat: 45–65% dari total kalori (≈ 225–325g per hari)
+    - WHO:
+    - Kalium: Tidak kurang dari 3.5g per hari
+
+    Parameter batas sehat di bawah ini disesuaikan untuk porsi makanan sebesar {porsi} gram (mengikuti porsi default 100g dari API).
+
+    Tambahan:
+    - Serat dianggap sangat cukup jika > 8g, cukup jika > 4g, dan hampir cukup jika > 2g.
+    - Karbohidrat dianggap sangat cukup jika > 75g, cukup jika > 37.5g, hampir cukup jika > 18.75g.
+    - Kalium dianggap sangat cukup jika > 1167mg, cukup jika > 583mg, hampir cukup jika > 292mg.
+    """
+
+    prompt = f"""
+    Nama makanan: {food.replace('_', ' ').title()}
+    Porsi: {porsi} gram
+
+    Gizi:
+    """ + "\n".join(gizi_lines) + f"""
+
+    {catatan_pedoman}
+
+    Batas Sehat Berdasarkan Porsi Ini:
+    """ + "\n".join(batas_lines) + f"""
+
+    Pertanyaan pengguna:
+    {user_q}
+
+    Tolong jawab langsung dan relevan dengan pertanyaan pengguna berdasarkan data di atas. Jangan membuat pertanyaan baru atau menjawab terlalu panjang jika tidak diminta. Fokus pada jawaban yang sesuai konteks. Lalu Jika pertanyaannya:
+
+    - Tentang kesehatan → evaluasi berdasarkan 5 parameter utama (lemak total, lemak jenuh, gula, natrium, kolesterol).
+    - Tentang penyakit tertentu → jelaskan relevansi dengan parameter di atas (misal: kolesterol tinggi → perhatikan kolesterol dan lemak jenuh).
+    - Tentang gizi tertentu → jawab dengan nilai spesifik dari data.
+    - Tentang semua gizi → beri ringkasan daftar gizi.
+    - Tentang porsi berlebih → kalikan logika batas sehat per porsi.
+    - Tentang alasan sehat/tidak sehat → berikan alasan langsung berdasarkan yang melebihi batas.
+    - Tentang serat, kalium, karbohidrat → sampaikan sebagai keterangan tambahan saja.
+    - Jika pengguna menyebut berat porsi lain (selain 100g), sesuaikan dengan logika proporsional.
+    """
+    return prompt
+
+
+# Client Gemini: stream(prompt) menghasilkan potongan teks begitu diterima
+class GeminiChatClient:
+    def __init__(self, api_key=None, model_name='models/gemini-1.5-flash'):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key if api_key is not None else os.getenv("GEMINI_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+# Client pengganti untuk pengujian offline: mengalirkan jawaban tetap kata per kata
+class StubChatClient:
+    def __init__(self, answer="Ini adalah jawaban contoh dari chatbot gizi.", first_token_delay=0.05, token_delay=0.01):
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def stream(self, prompt):
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(self.answer.split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+
+def make_chat_client(name=None, api_key=None):
+    name = name or CHAT_BACKEND
+    if name == "gemini":
+        return GeminiChatClient(api_key)
+    if name == "stub":
+        return StubChatClient()
+    raise ValueError(f"Backend chatbot tidak dikenal: {name}")
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(food, question, porsi=100, version=PROMPT_TEMPLATE_VERSION):
+    raw = "|".join([_normalize(food.replace('_', ' ')), _normalize(question), str(porsi), version])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# Cache jawaban chatbot dengan TTL dan batas jumlah entri (LRU)
+class ResponseCache:
+    def __init__(self, ttl=CHAT_CACHE_TTL, max_items=CHAT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'first_token_s_total': 0.0, 'streams': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and time.time() - entry[1] >= self.ttl:
+                del self._items[key]
+                entry = None
+            if entry is not None:
+                self._items.move_to_end(key)
+            self._stats['hits' if entry is not None else 'misses'] += 1
+            return entry[0] if entry is not None else None
+
+    def put(self, key, text):
+        with self._lock:
+            self._items[key] = (text, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self._stats['first_token_s_total'] += seconds
+            self._stats['streams'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._items))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['avg_first_token_s'] = stats['first_token_s_total'] / stats['streams'] if stats['streams'] else 0.0
+        return stats
+
+
+# Alirkan jawaban dari client lalu simpan ke cache setelah selesai. Jawaban kosong (error upstream
+# atau respons tanpa isi) tidak disimpan supaya tidak tampil kosong sampai TTL habis.
+def stream_answer(client, cache, key, prompt):
+    start = time.perf_counter()
+    parts = []
+    for chunk in client.stream(prompt):
+        if not parts:
+            cache.record_first_token(time.perf_counter() - start)
+        parts.append(chunk)
+        yield chunk
+    answer = "".join(parts)
+    if answer.strip():
+        cache.put(key, answer)
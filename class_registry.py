@@ -0,0 +1,74 @@
+import json
+import os
+
+CLASS_REGISTRY_PATH = os.getenv("CLASS_REGISTRY_PATH", "classes.json")
+
+
+# Daftar kelas makanan dari satu file data (classes.json). Urutan entri = urutan output model,
+# dan "model" menunjuk file Keras yang dilatih untuk daftar kelas ini.
+class ClassRegistry:
+    def __init__(self, classes, model=None, path=CLASS_REGISTRY_PATH):
+        self.path = path
+        self.model = model
+        self.classes = list(classes)
+        self.names = [entry['name'] for entry in self.classes]
+        self._by_name = {entry['name']: entry for entry in self.classes}
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def index(self, name):
+        return self._index[name]
+
+    def translate(self, name):
+        entry = self._by_name.get(name)
+        return entry['translation'] if entry and entry.get('translation') else name
+
+    @staticmethod
+    def english(name):
+        return name.replace('_', ' ').title()
+
+    # "Pai Apel (Apple Pie)", atau satu nama saja jika terjemahannya sama
+    def display_label(self, name):
+        translation = self.translate(name)
+        english = self.english(name)
+        return translation if translation.lower() == english.lower() else f"{translation} ({english})"
+
+    def image_path(self, name):
+        entry = self._by_name.get(name)
+        return entry.get('image') if entry else None
+
+    def add(self, name, translation=None, image=None):
+        if name in self._by_name:
+            raise ValueError(f"Kelas sudah terdaftar: {name}")
+        entry = {'name': name, 'translation': translation or self.english(name), 'image': image}
+        self.classes.append(entry)
+        self.names.append(name)
+        self._by_name[name] = entry
+        self._index[name] = len(self.names) - 1
+        return entry
+
+    def save(self, path=None):
+        path = path or self.path
+        lines = ['{', f'  "model": {json.dumps(self.model)},', '  "classes": [']
+        # Satu kelas per baris supaya diff mudah dibaca
+        lines += [f"    {json.dumps(entry, ensure_ascii=False)}{',' if i < len(self.classes) - 1 else ''}"
+                  for i, entry in enumerate(self.classes)]
+        lines += ['  ]', '}']
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def load_registry(path=CLASS_REGISTRY_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return ClassRegistry(data['classes'], data.get('model'), path)
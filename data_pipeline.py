@@ -0,0 +1,270 @@
+import argparse
+import io
+import os
+import random
+import time
+
+import tensorflow as tf
+
+from preprocessing import load_pixels
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 32
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+# Daftar file + label dengan urutan kelas dan pembagian validasi yang sama seperti
+# ImageDataGenerator.flow_from_directory(validation_split=...): per kelas, bagian awal
+# (sesuai urutan nama file) menjadi data validasi, sisanya data latih.
+# class_names (misalnya dari classes.json) menetapkan urutan label; default urutan folder.
+def list_files(directory, validation_split=0.0, class_names=None):
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    train, val = ([], []), ([], [])
+    for index, class_name in enumerate(class_names):
+        folder = os.path.join(directory, class_name)
+        if not os.path.isdir(folder):
+            continue
+        files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+        split = int(len(files) * validation_split)
+        for i, file in enumerate(files):
+            paths, labels = val if i < split else train
+            paths.append(os.path.join(folder, file))
+            labels.append(index)
+    return train, val, class_names
+
+
+# Decode + resize lewat preprocessing.load_pixels (PIL), sama persis dengan aplikasi.
+# tf.io.decode_image + tf.image.resize memberi piksel yang sedikit berbeda dari PIL.
+def _decode_bytes(encoded, image_size):
+    height, width = image_size
+    image = tf.numpy_function(lambda data: load_pixels(io.BytesIO(data), (width, height), draft=False),
+                              [encoded], tf.uint8, stateful=False)
+    image.set_shape((height, width, 3))
+    return image
+
+
+def _decode_file(path, label, image_size):
+    return _decode_bytes(tf.io.read_file(path), image_size), label
+
+
+# Augmentasi setara ImageDataGenerator di notebook (rotasi 20°, geser 0.2, zoom 0.2, flip horizontal),
+# dijalankan sebagai layer Keras per batch. Shear tidak tersedia sebagai layer bawaan sehingga dilewati.
+def augmentation_layers(seed=None):
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomRotation(20 / 360, fill_mode='nearest', seed=seed),
+        tf.keras.layers.RandomTranslation(0.2, 0.2, fill_mode='nearest', seed=seed),
+        tf.keras.layers.RandomZoom(0.2, fill_mode='nearest', seed=seed),
+        tf.keras.layers.RandomFlip('horizontal', seed=seed),
+    ], name='augmentation')
+
+
+def preprocessing_fn(mode='mobilenet_v2'):
+    if mode == 'mobilenet_v2':
+        return tf.keras.applications.mobilenet_v2.preprocess_input
+    if mode == 'rescale':
+        return lambda x: x / 255.0
+    raise ValueError(f"Mode praproses tidak dikenal: {mode}")
+
+
+# shuffle_buffer: ukuran buffer acak setelah decode/cache (None = tidak diacak di tahap ini)
+def _finish(dataset, num_classes, batch_size, shuffle_buffer, augment, preprocess, cache, seed):
+    if cache:
+        dataset = dataset.cache(cache if isinstance(cache, str) else '')
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size, num_parallel_calls=AUTOTUNE)
+    preprocess = preprocessing_fn(preprocess)
+    augmenter = augmentation_layers(seed) if augment else None
+
+    def transform(images, labels):
+        images = tf.cast(images, tf.float32)
+        if augmenter is not None:
+            images = augmenter(images, training=True)
+        return preprocess(images), tf.one_hot(labels, num_classes)
+
+    return dataset.map(transform, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+
+# Dengan shuffle=True seluruh daftar file (hanya path, murah) diacak setiap epoch sebelum decode,
+# seperti flow_from_directory (list_files mengurutkan per kelas, jadi buffer kecil tidak cukup)
+def _from_files(paths, labels, image_size, shuffle=False, seed=None):
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    return dataset.map(lambda p, l: _decode_file(p, l, image_size), num_parallel_calls=AUTOTUNE, deterministic=False)
+
+
+# Satu fungsi untuk train/val/test. Hasil: dict berisi 'train', 'val', 'test' (bisa None)
+# dan 'class_names'. Label one-hot seperti class_mode='categorical'.
+#   preprocess: 'mobilenet_v2' (sama dengan pelatihan di notebook) atau 'rescale' (1/255)
+#   cache: False, True (memori), atau path file cache di disk
+#   tfrecord_dir: jika diisi, baca shard dari write_tfrecords() alih-alih file gambar
+#   class_names: urutan label (misalnya load_registry().names); default urutan folder
+def build_datasets(train_dir='food', test_dir=None, image_size=IMAGE_SIZE, batch_size=BATCH_SIZE,
+                   validation_split=0.2, preprocess='mobilenet_v2', augment=True, cache=False,
+                   tfrecord_dir=None, seed=123, class_names=None):
+    result = {'train': None, 'val': None, 'test': None}
+
+    if tfrecord_dir:
+        class_names = read_class_names(tfrecord_dir)
+        splits = {'train': read_tfrecords(tfrecord_dir, 'train', image_size),
+                  'val': read_tfrecords(tfrecord_dir, 'val', image_size),
+                  'test': read_tfrecords(tfrecord_dir, 'test', image_size)}
+    else:
+        (train_paths, train_labels), (val_paths, val_labels), class_names = list_files(train_dir, validation_split,
+                                                                                       class_names)
+        splits = {'train': _from_files(train_paths, train_labels, image_size, shuffle=True, seed=seed)
+                  if train_paths else None,
+                  'val': _from_files(val_paths, val_labels, image_size) if val_paths else None,
+                  'test': None}
+        if test_dir:
+            (test_paths, test_labels), _, _ = list_files(test_dir, class_names=class_names)
+            splits['test'] = _from_files(test_paths, test_labels, image_size)
+
+    num_classes = len(class_names)
+    for name, dataset in splits.items():
+        if dataset is None:
+            continue
+        is_train = name == 'train'
+        split_cache = f"{cache}_{name}" if isinstance(cache, str) else cache
+        # Nama file diacak penuh sebelum decode. Dengan cache, urutan epoch pertama (sudah tercampur)
+        # yang tersimpan, lalu diacak ulang dengan buffer terbatas seperti shard TFRecord yang diacak
+        # saat ditulis. Buffer seukuran dataset akan menahan seluruh gambar hasil decode di memori.
+        shuffle_buffer = None
+        if is_train and (tfrecord_dir or cache):
+            shuffle_buffer = max(1000, batch_size * 32)
+        result[name] = _finish(dataset, num_classes, batch_size, shuffle_buffer, augment=augment and is_train,
+                               preprocess=preprocess, cache=split_cache, seed=seed)
+    result['class_names'] = class_names
+    return result
+
+
+def _bytes_feature(value):
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
+
+
+def _int_feature(value):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+
+
+# Simpan dataset sebagai shard TFRecord (byte JPEG asli + label) supaya pembacaan berurutan dan paralel
+def write_tfrecords(train_dir='food', output_dir='tfrecords', test_dir=None, validation_split=0.2, num_shards=16,
+                    class_names=None, seed=123):
+    os.makedirs(output_dir, exist_ok=True)
+    (train_paths, train_labels), (val_paths, val_labels), class_names = list_files(train_dir, validation_split,
+                                                                                   class_names)
+    # Data latih diacak sebelum ditulis supaya setiap shard (dan buffer shuffle saat dibaca) berisi campuran kelas
+    train = list(zip(train_paths, train_labels))
+    random.Random(seed).shuffle(train)
+    splits = {'train': ([p for p, _ in train], [l for _, l in train]), 'val': (val_paths, val_labels)}
+    if test_dir:
+        splits['test'] = list_files(test_dir, class_names=class_names)[0]
+
+    for split, (paths, labels) in splits.items():
+        shards = max(1, min(num_shards, len(paths)))
+        writers = [tf.io.TFRecordWriter(os.path.join(output_dir, f"{split}-{i:05d}-of-{shards:05d}.tfrecord"))
+                   for i in range(shards)]
+        for i, (path, label) in enumerate(zip(paths, labels)):
+            with open(path, 'rb') as f:
+                example = tf.train.Example(features=tf.train.Features(feature={
+                    'image': _bytes_feature(f.read()),
+                    'label': _int_feature(label),
+                }))
+            writers[i % shards].write(example.SerializeToString())
+        for writer in writers:
+            writer.close()
+
+    with open(os.path.join(output_dir, 'class_names.txt'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(class_names))
+    return output_dir
+
+
+def read_class_names(tfrecord_dir):
+    with open(os.path.join(tfrecord_dir, 'class_names.txt'), encoding='utf-8') as f:
+        return f.read().split("\n")
+
+
+def read_tfrecords(tfrecord_dir, split, image_size=IMAGE_SIZE):
+    files = tf.io.gfile.glob(os.path.join(tfrecord_dir, f"{split}-*.tfrecord"))
+    if not files:
+        return None
+    spec = {
+        'image': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def parse(record):
+        example = tf.io.parse_single_example(record, spec)
+        return _decode_bytes(example['image'], image_size), tf.cast(example['label'], tf.int32)
+
+    dataset = tf.data.Dataset.from_tensor_slices(sorted(files))
+    dataset = dataset.interleave(tf.data.TFRecordDataset, cycle_length=AUTOTUNE, num_parallel_calls=AUTOTUNE,
+                                 deterministic=split != 'train')
+    return dataset.map(parse, num_parallel_calls=AUTOTUNE)
+
+
+# Ukur throughput (gambar/detik) dari dataset atau generator Keras
+def measure_throughput(dataset, steps=50, warmup_steps=5):
+    iterator = iter(dataset)
+    for _ in range(warmup_steps):
+        next(iterator)
+    images = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        try:
+            batch, _ = next(iterator)
+        except StopIteration:
+            break
+        images += len(batch)
+    elapsed = time.perf_counter() - start
+    return images / elapsed if elapsed else 0.0
+
+
+def _generator_baseline(train_dir, batch_size, validation_split):
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    datagen = ImageDataGenerator(
+        preprocessing_function=tf.keras.applications.mobilenet_v2.preprocess_input,
+        validation_split=validation_split,
+        rotation_range=20,
+        width_shift_range=0.2,
+        height_shift_range=0.2,
+        shear_range=0.2,
+        zoom_range=0.2,
+        horizontal_flip=True,
+        fill_mode='nearest'
+    )
+    return datagen.flow_from_directory(train_dir, target_size=IMAGE_SIZE, batch_size=batch_size,
+                                       class_mode='categorical', subset='training')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline input tf.data untuk pelatihan dan evaluasi")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bench_parser = subparsers.add_parser("benchmark", help="Ukur gambar/detik pipeline tf.data")
+    bench_parser.add_argument("--train-dir", default="food")
+    bench_parser.add_argument("--tfrecord-dir")
+    bench_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    bench_parser.add_argument("--steps", type=int, default=50)
+    bench_parser.add_argument("--compare-generator", action="store_true",
+                              help="Bandingkan dengan ImageDataGenerator.flow_from_directory")
+
+    shard_parser = subparsers.add_parser("write-tfrecords", help="Tulis dataset sebagai shard TFRecord")
+    shard_parser.add_argument("--train-dir", default="food")
+    shard_parser.add_argument("--test-dir", default="foodtest")
+    shard_parser.add_argument("--output-dir", default="tfrecords")
+    shard_parser.add_argument("--num-shards", type=int, default=16)
+
+    args = parser.parse_args()
+    if args.command == "write-tfrecords":
+        output = write_tfrecords(args.train_dir, args.output_dir, args.test_dir or None, num_shards=args.num_shards)
+        print(f"Shard TFRecord disimpan di {output}")
+    else:
+        datasets = build_datasets(args.train_dir, batch_size=args.batch_size, tfrecord_dir=args.tfrecord_dir)
+        print(f"tf.data: {measure_throughput(datasets['train'], args.steps):.1f} gambar/detik")
+        if args.compare_generator:
+            generator = _generator_baseline(args.train_dir, args.batch_size, 0.2)
+            print(f"ImageDataGenerator: {measure_throughput(generator, args.steps):.1f} gambar/detik")
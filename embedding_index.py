@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from preprocessing import IMAGE_EXTENSIONS, PREPROCESSING_VERSION, BatchBuffer
+
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", "embedding_index")
+# Nama layer embedding; kosong = input layer klasifikasi terakhir (Dense 128 sebelum softmax)
+EMBEDDING_LAYER = os.getenv("EMBEDDING_LAYER", "")
+EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "8"))  # jumlah partisi IVF yang diperiksa per query
+SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "5"))
+LOW_CONFIDENCE_THRESHOLD = float(os.getenv("LOW_CONFIDENCE_THRESHOLD", "0.5"))
+MIN_SIMILARITY = float(os.getenv("MIN_SIMILARITY", "0.5"))  # cosine; di bawah ini gambar dianggap asing
+MIN_VOTE_SHARE = float(os.getenv("MIN_VOTE_SHARE", "0.6"))  # porsi suara tetangga agar dianggap tidak setuju
+
+# Baris matriks yang diubah ke float32 sekaligus saat pencarian brute-force
+SEARCH_CHUNK_ROWS = 65536
+
+
+class EmbeddingIndexError(Exception):
+    pass
+
+
+# Model Keras dengan dua output: probabilitas kelas dan embedding, sehingga satu forward pass cukup
+def with_embedding_output(model, layer_name=EMBEDDING_LAYER):
+    import tensorflow as tf
+
+    embedding = model.get_layer(layer_name).output if layer_name else model.layers[-1].input
+    return tf.keras.Model(model.inputs, [model.output, embedding])
+
+
+# Hasil InferenceEngine bisa berupa vektor probabilitas saja (TFLite) atau (probabilitas, embedding)
+def split_prediction(result):
+    if isinstance(result, tuple):
+        return result[0], result[1]
+    return result, None
+
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, k):
+    k = min(k, scores.shape[1])
+    indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+# K-means sferis sederhana (cosine) untuk partisi IVF
+def kmeans(vectors, nlist, iterations=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(nlist):
+            members = vectors[assignment == i]
+            # Partisi kosong diisi ulang dengan vektor acak supaya jumlah partisi tetap
+            centroids[i] = members.sum(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids = l2_normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+# Indeks embedding gambar referensi. Matriks float16 (N, D) yang sudah dinormalisasi L2 dibuka
+# dengan memory map, jadi hanya halaman yang dibaca yang masuk memori dan dibagi antar proses.
+# Tanpa IVF pencarian brute-force (perkalian matriks per potongan); dengan IVF baris diurutkan
+# per partisi sehingga setiap partisi yang diperiksa adalah satu potongan berurutan di file.
+class EmbeddingIndex:
+    def __init__(self, directory=EMBEDDING_INDEX_DIR, nprobe=EMBEDDING_NPROBE):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.paths = self.meta['paths']
+        self.labels = self.meta['labels']
+        # Indeks lama belum mencatat jumlah gambar per kelas, hitung dari label
+        self.images_per_class = self.meta.get('images_per_class') or min(Counter(self.labels).values(), default=0)
+        self.nprobe = nprobe
+        self.centroids = None
+        self.offsets = None
+        ivf_path = os.path.join(directory, 'ivf.npz')
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.centroids = ivf['centroids']
+                self.offsets = ivf['offsets']
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def _search_range(self, queries, start, stop, k):
+        best_scores = best_indices = None
+        for chunk_start in range(start, stop, SEARCH_CHUNK_ROWS):
+            chunk_stop = min(chunk_start + SEARCH_CHUNK_ROWS, stop)
+            chunk = np.asarray(self.embeddings[chunk_start:chunk_stop], dtype=np.float32)
+            scores, indices = _top_k(queries @ chunk.T, k)
+            indices += chunk_start
+            if best_scores is not None:
+                scores, order = _top_k(np.concatenate([best_scores, scores], axis=1), k)
+                indices = np.take_along_axis(np.concatenate([best_indices, indices], axis=1), order, axis=1)
+            best_scores, best_indices = scores, indices
+        return best_scores, best_indices
+
+    def _search_ivf(self, query, k, nprobe):
+        probe = np.argsort(-(self.centroids @ query))[:nprobe]
+        scores, indices = [], []
+        for i in probe:
+            start, stop = int(self.offsets[i]), int(self.offsets[i + 1])
+            if stop > start:
+                s, idx = self._search_range(query[np.newaxis], start, stop, k)
+                scores.append(s[0])
+                indices.append(idx[0])
+        if not scores:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores, order = _top_k(np.concatenate(scores)[np.newaxis], k)
+        return scores[0], np.concatenate(indices)[order[0]]
+
+    # queries (Q, D) atau (D,) -> (skor cosine, indeks baris), masing-masing (Q, k)
+    def search(self, queries, k=SIMILAR_TOP_K, nprobe=None):
+        queries = l2_normalize(np.atleast_2d(queries))
+        if len(self) == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        if self.centroids is None:
+            return self._search_range(queries, 0, len(self), k)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        results = [self._search_ivf(query, k, nprobe) for query in queries]
+        width = min(len(scores) for scores, _ in results)
+        return (np.stack([scores[:width] for scores, _ in results]),
+                np.stack([indices[:width] for _, indices in results]))
+
+    def neighbors(self, embedding, k=SIMILAR_TOP_K):
+        scores, indices = self.search(embedding, k)
+        return [{'label': self.labels[i], 'path': self.paths[i], 'similarity': float(score)}
+                for score, i in zip(scores[0], indices[0])]
+
+    # Gabungkan prediksi klasifikasi dengan tetangga terdekat: makanan serupa (satu per label)
+    # dan tanda prediksi kurang yakin jika probabilitas rendah, tetangga tidak setuju,
+    # atau gambar jauh dari semua gambar referensi. Aturan tetangga hanya dipakai jika setiap kelas
+    # punya beberapa gambar referensi: dengan satu gambar per kelas (food_images/) satu tetangga
+    # terdekat dari kelas lain belum berarti klasifikasinya salah.
+    def assess(self, embedding, predicted_label, confidence, k=SIMILAR_TOP_K,
+               min_confidence=LOW_CONFIDENCE_THRESHOLD, min_similarity=MIN_SIMILARITY,
+               min_vote_share=MIN_VOTE_SHARE):
+        neighbors = self.neighbors(embedding, k * 4)
+        votes = defaultdict(float)
+        for neighbor in neighbors[:k]:
+            votes[neighbor['label']] += neighbor['similarity']
+        neighbor_label = max(votes, key=votes.get) if votes else None
+        total_votes = sum(max(vote, 0.0) for vote in votes.values())
+        vote_share = max(votes[neighbor_label], 0.0) / total_votes if total_votes > 0 else 0.0
+        best_similarity = neighbors[0]['similarity'] if neighbors else 0.0
+
+        reasons = []
+        if confidence < min_confidence:
+            reasons.append("skor kepercayaan rendah")
+        if (self.images_per_class >= 2 and neighbor_label is not None and neighbor_label != predicted_label
+                and vote_share >= min_vote_share):
+            reasons.append("gambar paling mirip dengan makanan lain")
+        if best_similarity < min_similarity:
+            reasons.append("gambar tidak mirip dengan gambar referensi mana pun")
+
+        similar, seen = [], set()
+        for neighbor in neighbors:
+            if neighbor['label'] not in seen:
+                seen.add(neighbor['label'])
+                similar.append(neighbor)
+        return {
+            'similar': similar[:k],
+            'neighbor_label': neighbor_label,
+            'vote_share': vote_share,
+            'best_similarity': best_similarity,
+            'low_confidence': bool(reasons),
+            'reasons': reasons,
+        }
+
+
+# Indeks dari disk; None jika belum dibuat. Indeks dari model atau praproses lain ditolak.
+def load_index(directory=EMBEDDING_INDEX_DIR, model_path=None, nprobe=EMBEDDING_NPROBE):
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        return None
+    index = EmbeddingIndex(directory, nprobe)
+    if index.meta.get('preprocessing') != PREPROCESSING_VERSION:
+        raise EmbeddingIndexError("Indeks embedding dibuat dengan praproses lain, buat ulang indeksnya")
+    if model_path is not None and os.path.exists(model_path) and index.meta.get('model_size') != os.path.getsize(model_path):
+        raise EmbeddingIndexError("Indeks embedding dibuat dari model lain, buat ulang indeksnya")
+    return index
+
+
+# Gambar referensi: folder per kelas (food/<kelas>/*.jpg) atau folder datar (food_images/<kelas>.jpg)
+def list_reference_images(source):
+    entries = sorted(os.listdir(source))
+    class_dirs = [d for d in entries if os.path.isdir(os.path.join(source, d))]
+    if class_dirs:
+        return [(os.path.join(source, d, file), d) for d in class_dirs
+                for file in sorted(os.listdir(os.path.join(source, d))) if file.lower().endswith(IMAGE_EXTENSIONS)]
+    return [(os.path.join(source, file), os.path.splitext(file)[0])
+            for file in entries if file.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+# Hitung embedding semua gambar referensi (offline) dan simpan sebagai indeks di `output_dir`.
+# nlist > 0 menambahkan partisi IVF untuk korpus besar (misalnya seluruh food/).
+def build_index(source='food_images', output_dir=EMBEDDING_INDEX_DIR, model_path=None, layer_name=EMBEDDING_LAYER,
+                batch_size=32, nlist=0):
+    import tensorflow as tf
+    from tflite_backend import KERAS_MODEL_PATH
+
+    model_path = model_path or KERAS_MODEL_PATH
+    model = with_embedding_output(tf.keras.models.load_model(model_path), layer_name)
+    samples = list_reference_images(source)
+    if not samples:
+        raise EmbeddingIndexError(f"Tidak ada gambar di {source}")
+    dim = int(model.outputs[1].shape[-1])
+    os.makedirs(output_dir, exist_ok=True)
+
+    vectors = np.empty((len(samples), dim), dtype=np.float32)
+    buffer = BatchBuffer(batch_size)
+    for i in range(0, len(samples), batch_size):
+        chunk = samples[i:i + batch_size]
+        _, embeddings = model.predict_on_batch(buffer.load([path for path, _ in chunk]))
+        vectors[i:i + len(chunk)] = l2_normalize(embeddings)
+
+    paths = [path for path, _ in samples]
+    labels = [label for _, label in samples]
+    ivf_path = os.path.join(output_dir, 'ivf.npz')
+    if nlist:
+        nlist = min(nlist, len(samples))
+        centroids, assignment = kmeans(vectors, nlist)
+        order = np.argsort(assignment, kind='stable')
+        vectors = vectors[order]
+        paths = [paths[i] for i in order]
+        labels = [labels[i] for i in order]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        np.savez(ivf_path, centroids=centroids, offsets=offsets)
+    elif os.path.exists(ivf_path):
+        os.remove(ivf_path)
+
+    np.save(os.path.join(output_dir, 'embeddings.npy'), vectors.astype(np.float16))
+    meta = {
+        'paths': paths,
+        'labels': labels,
+        'images_per_class': min(Counter(labels).values()),
+        'dim': dim,
+        'layer': layer_name or model.layers[-1].name,
+        'model': os.path.basename(model_path),
+        'model_size': os.path.getsize(model_path),
+        'preprocessing': PREPROCESSING_VERSION,
+        'nlist': nlist,
+        'created_at': time.time(),
+    }
+    with open(os.path.join(output_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return output_dir
+
+
+# Latensi pencarian (ms per query) dengan vektor acak dari indeks itu sendiri
+def measure_search(index, queries=200, k=SIMILAR_TOP_K, nprobe=None):
+    rng = np.random.default_rng(0)
+    sample = np.asarray(index.embeddings[rng.integers(len(index), size=queries)], dtype=np.float32)
+    start = time.perf_counter()
+    for query in sample:
+        index.search(query, k, nprobe)
+    return (time.perf_counter() - start) / queries * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indeks embedding untuk makanan serupa")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Hitung embedding gambar referensi dan simpan indeks")
+    build_parser.add_argument("--source", default="food_images")
+    build_parser.add_argument("--output-dir", default=EMBEDDING_INDEX_DIR)
+    build_parser.add_argument("--model")
+    build_parser.add_argument("--layer", default=EMBEDDING_LAYER)
+    build_parser.add_argument("--batch-size", type=int, default=32)
+    build_parser.add_argument("--nlist", type=int, default=0, help="Jumlah partisi IVF (0 = brute-force)")
+
+    bench_parser = subparsers.add_parser("bench", help="Ukur latensi pencarian")
+    bench_parser.add_argument("--index-dir", default=EMBEDDING_INDEX_DIR)
+    bench_parser.add_argument("--k", type=int, default=SIMILAR_TOP_K)
+    bench_parser.add_argument("--nprobe", type=int, default=EMBEDDING_NPROBE)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        output = build_index(args.source, args.output_dir, args.model, args.layer, args.batch_size, args.nlist)
+        print(f"Indeks embedding disimpan di {output}")
+        if EmbeddingIndex(output).images_per_class < 2:
+            print("Hanya satu gambar referensi per kelas: tanda 'mirip makanan lain' tidak dipakai. "
+                  "Bangun dari food/ (--source food) untuk mengaktifkannya.")
+    else:
+        index = load_index(args.index_dir)
+        if index is None:
+            raise SystemExit(f"Indeks tidak ditemukan di {args.index_dir}")
+        print(f"{len(index)} vektor, dimensi {index.embeddings.shape[1]}, "
+              f"IVF: {'ya' if index.centroids is not None else 'tidak'}")
+        print(f"Pencarian: {measure_search(index, k=args.k, nprobe=args.nprobe):.3f} ms/query")
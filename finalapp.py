@@ -1,214 +1,186 @@
 import streamlit as st
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import img_to_array, load_img
-import requests
+import pandas as pd
 import os
 import time
+import io
 import streamlit.components.v1 as components
-from PIL import Image
+from thumbnails import ThumbnailCache
+from nutrition import NutritionError, NutritionStore
+from inference import INFERENCE_WORKERS, InferenceEngine
+from inference_server import INFERENCE_SERVER, INFERENCE_SERVER_WORKERS, RemoteModel, ServerBusy
+from tflite_backend import KERAS_MODEL_PATH, TFLITE_MODEL_PATH, TFLITE_THREADS, TFLiteModel
+from prediction_cache import PredictionCache, hash_image_bytes, model_version
+from bulk import classify_images, iter_uploaded_images
+from preprocessing import PREPROCESSING_VERSION, preprocess_image
+from nutrition_scoring import score_food
+from class_registry import load_registry
+from chatbot import ResponseCache, build_prompt, cache_key, make_chat_client, stream_answer
+from embedding_index import (EMBEDDING_INDEX_DIR, LOW_CONFIDENCE_THRESHOLD, EmbeddingIndexError, load_index,
+                             split_prediction, with_embedding_output)
+from tracing import get_tracer
+from http_client import get_shared_client
 
 NUTRITION_API_KEY = os.getenv("NUTRITION_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Load trained CNN model lazily to avoid permission errors
+# Pengaturan galeri (GALLERY_PAGE_SIZE=0 menampilkan semua gambar sekaligus)
+GALLERY_COLUMNS = int(os.getenv("GALLERY_COLUMNS", "4"))
+GALLERY_PAGE_SIZE = int(os.getenv("GALLERY_PAGE_SIZE", "12"))
+
+# Panel debug berisi durasi tiap tahap dan statistik cache (DEBUG_PANEL=1)
+DEBUG_PANEL = os.getenv("DEBUG_PANEL", "0") == "1"
+
+# Backend model: "keras" (default) atau "tflite" (interpreter ringan, lihat tflite_backend.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "keras")
+
+# Model dimuat di thread latar belakang (BACKGROUND_MODEL_LOAD=0 untuk memuat secara blocking)
+BACKGROUND_MODEL_LOAD = os.getenv("BACKGROUND_MODEL_LOAD", "1") == "1"
+
+# Daftar kelas (nama, terjemahan, gambar galeri) dan file model dari classes.json
 @st.cache_resource
+def get_class_registry():
+    return load_registry()
+
+registry = get_class_registry()
+class_names = registry.names
+keras_model_path = registry.model or KERAS_MODEL_PATH
+
+# Load trained CNN model lazily to avoid permission errors
+# TensorFlow baru di-import di sini supaya halaman tidak menunggu import TF.
+# Model Keras juga mengeluarkan embedding untuk pencarian makanan serupa (lihat embedding_index.py).
+# Dengan INFERENCE_SERVER model berjalan di sidecar multi-proses (lihat inference_server.py);
+# MODEL_BACKEND sebaiknya disamakan dengan backend sidecar supaya versi cache prediksi tepat.
 def load_mobilenet_model():
-    return load_model('final_mobilenetv2_food_finetune_100.keras')
-
-model = load_mobilenet_model()
-
-class_names = [
-    'apple_pie', 'baby_back_ribs', 'baklava', 'beef_tartare', 'beet_salad', 'beignet', 'bibimbap', 'bread_pudding', 'breakfast_burrito', 
-    'bruschetta', 'caesar_salad', 'calamari', 'cannoli', 'caprese_salad', 'carbonara', 'carpaccio', 'carrot_cake', 'ceviche', 
-    'cheese_plate', 'cheesecake', 'chicken_curry', 'chicken_quesadilla', 'chicken_wings', 
-    'chocolate_cake', 'chocolate_mousse', 'churros', 'clam_chowder', 'club_sandwich', 'crab_cakes', 'creme_brulee', 
-    'cup_cakes', 'deviled_eggs', 'donuts', 'dumplings', 'edamame', 'eggs_benedict', 
-    'escargots', 'falafel', 'filet_mignon', 'fish_and_chips', 'foie_gras', 'french_fries', 
-    'french_onion_soup', 'french_toast', 'fried_chicken', 'fried_fish', 'fried_rice', 'frozen_yogurt', 'garlic_bread', 'gnocchi', 
-    'greek_salad', 'grilled_cheese_sandwich', 'grilled_salmon', 'guacamole', 'gyoza', 'hamburger', 'hot_and_sour_soup', 'hot_dog', 'huevos_rancheros', 'hummus', 
-    'ice_cream', 'lasagna', 'lobster_bisque', 'macaroni_and_cheese', 'macarons', 
-    'miso_soup', 'mussels', 'nachos', 'omelette', 'onion_rings', 'oysters', 'pad_thai', 'paella', 
-    'pancakes', 'panna_cotta', 'peking_duck', 'pho', 'pizza', 'pork_chop', 'poutine', 'prime_rib', 
-    'pulled_pork_sandwich', 'ramen', 'ravioli', 'rendang', 'risotto', 'samosa', 'sashimi', 'satay', 'scallops', 'seaweed_salad', 
-    'shrimp_and_grits', 'spaghetti_bolognese', 'spring_rolls', 'steak', 'strawberry_shortcake', 
-    'sushi', 'tacos', 'tiramisu', 'waffles'
-]
-
-def translate_food_name(name):
-    translation_dict = {
-    'apple_pie': 'Pai Apel', 'baby_back_ribs': 'Iga Panggang', 'baklava': 'Baklava', 'beef_tartare': 'Tartar Daging Sapi',
-    'beet_salad': 'Salad Bit', 'beignet': 'Roti Goreng Prancis', 'bibimbap': 'Bibimbap', 'bread_pudding': 'Puding Roti', 'breakfast_burrito': 'Burrito Sarapan',
-    'bruschetta': 'Bruschetta', 'caesar_salad': 'Salad Caesar', 'calamari': 'Calamari', 'cannoli': 'Cannoli',
-    'caprese_salad': 'Salad Caprese', 'carbonara': 'Spageti Carbonara', 'carpaccio': 'Carpaccio', 'carrot_cake': 'Kue Wortel', 'ceviche': 'Ceviche',
-    'cheese_plate': 'Piring Keju', 'cheesecake': 'Kue Keju', 'chicken_curry': 'Kari Ayam',
-    'chicken_quesadilla': 'Quesadilla Ayam', 'chicken_wings': 'Sayap Ayam', 'chocolate_cake': 'Kue Coklat', 'chocolate_mousse': 'Coklat Mousse',
-    'churros': 'Churros', 'clam_chowder': 'Sup Krim Kerang', 'club_sandwich': 'Sandwich Klub', 'crab_cakes': 'Kue Kepiting',
-    'creme_brulee': 'Creme Brulee', 'cup_cakes': 'Kue Cangkir', 'deviled_eggs': 'Telur Isi',
-    'donuts': 'Donat', 'dumplings': 'Pangsit', 'edamame': 'Kedelai Jepang',
-    'eggs_benedict': 'Telur Benedict', 'escargots': 'Siput', 'falafel': 'Falafel',
-    'filet_mignon': 'Daging Sapi Filet', 'fish_and_chips': 'Ikan dan Kentang Goreng', 'foie_gras': 'Foie Gras', 'french_fries': 'Kentang Goreng',
-    'french_onion_soup': 'Sup Bawang Prancis', 'french_toast': 'Roti Panggang Prancis', 'fried_chicken': 'Ayam Goreng', 'fried_fish': 'Ikan Goreng', 'fried_rice': 'Nasi Goreng', 'frozen_yogurt': 'Yogurt Beku',
-    'garlic_bread': 'Roti Bawang Putih', 'gnocchi': 'Gnocchi', 'greek_salad': 'Salad Yunani', 'grilled_cheese_sandwich' : 'Sandwich Keju Panggang', 'grilled_salmon': 'Salmon Panggang',
-    'guacamole': 'Guacamole', 'gyoza': 'Gyoza', 'hamburger': 'Hamburger',
-    'hot_and_sour_soup': 'Sup Asam Pedas', 'hot_dog': 'Hot Dog', 'huevos_rancheros': 'Huevos Rancheros', 'hummus': 'Hummus', 'ice_cream': 'Es Krim',
-    'lasagna': 'Lasagna', 'lobster_bisque': 'Lobster Bisque', 'macaroni_and_cheese': 'Makaroni dan Keju',
-    'macarons': 'Makaron', 'miso_soup': 'Sup Miso', 'mussels': 'Kerang',
-    'nachos': 'Nachos', 'omelette': 'Omelet', 'onion_rings': 'Cincin Bawang', 'oysters': 'Tiram',
-    'pad_thai': 'Pad Thai', 'paella': 'Paella', 'pancakes': 'Panekuk',
-    'panna_cotta': 'Panna Cotta', 'peking_duck': 'Bebek Peking', 'pho': 'Pho',
-    'pizza': 'Pizza', 'pork_chop': 'Potongan Daging Babi', 'poutine': 'Poutine', 'prime_rib': 'Iga Utama',
-    'pulled_pork_sandwich': 'Sandwich Babi Suwir', 'ramen': 'Ramen', 'ravioli': 'Ravioli', 'rendang': 'Rendang', 'risotto': 'Risotto',
-    'samosa': 'Samosa', 'sashimi': 'Sashimi', 'satay': 'Sate', 'scallops': 'Simping', 'seaweed_salad': 'Salad Rumput Laut',
-    'shrimp_and_grits': 'Udang dan Bubur Jagung', 'spaghetti_bolognese': 'Spageti Bolognese', 'spring_rolls': 'Lumpia', 'steak': 'Steak',
-    'strawberry_shortcake': 'Kue Stroberi', 'sushi': 'Sushi', 'tacos': 'Taco', 'tiramisu': 'Tiramisu',
-    'waffles': 'Wafel'
-    }
-    return translation_dict.get(name, name)
+    if INFERENCE_SERVER:
+        return RemoteModel(INFERENCE_SERVER).wait_ready()
+    if MODEL_BACKEND == "tflite":
+        return TFLiteModel(TFLITE_MODEL_PATH, num_threads=TFLITE_THREADS)
+    from tensorflow.keras.models import load_model
+    model = load_model(keras_model_path)
+    if model.output_shape[-1] != len(registry):
+        raise ValueError(f"Model {keras_model_path} memiliki {model.output_shape[-1]} kelas, "
+                         f"sedangkan {registry.path} memiliki {len(registry)} kelas")
+    return with_embedding_output(model)
+
+# Semua sesi mengirim gambar ke satu mesin inferensi yang menggabungkan
+# permintaan bersamaan menjadi satu batch
+@st.cache_resource
+def get_inference_engine():
+    return InferenceEngine(
+        load_mobilenet_model,
+        # Satu thread per worker sidecar supaya semua proses worker bisa terpakai bersamaan
+        num_workers=INFERENCE_SERVER_WORKERS if INFERENCE_SERVER else INFERENCE_WORKERS,
+        background=BACKGROUND_MODEL_LOAD,
+        preload_modules=("tensorflow",) if MODEL_BACKEND == "keras" and not INFERENCE_SERVER else (),
+        warmup_shape=(1, 224, 224, 3),
+    )
+
+engine = get_inference_engine()
+
+# Hasil prediksi disimpan per hash isi gambar, jadi unggahan ulang / rerun tidak perlu decode dan predict lagi
+@st.cache_resource
+def get_prediction_cache():
+    model_path = TFLITE_MODEL_PATH if MODEL_BACKEND == "tflite" else keras_model_path
+    return PredictionCache(f"{model_version(model_path, MODEL_BACKEND)}:{PREPROCESSING_VERSION}")
+
+# Indeks embedding gambar referensi (dibuat offline: python embedding_index.py build)
+@st.cache_resource
+def get_embedding_index():
+    return load_index(EMBEDDING_INDEX_DIR, model_path=keras_model_path)
+
+# Pencatat durasi tiap tahap (histogram + format Prometheus, lihat tracing.py)
+tracer = get_tracer()
+
+# Data nutrisi dari cache lokal (SQLite), API Ninjas hanya dipanggil jika data kedaluwarsa
+@st.cache_resource
+def get_nutrition_store():
+    return NutritionStore()
 
 # === Gemini integration (deferred to avoid Keras conflict) ===
+# CHAT_BACKEND=stub mengganti Gemini dengan client lokal untuk pengujian offline
 @st.cache_resource
 def get_gemini_model():
-    import google.generativeai as genai
-    genai.configure(api_key=GEMINI_API_KEY)
-    return genai.GenerativeModel('models/gemini-1.5-flash')
+    return make_chat_client(api_key=GEMINI_API_KEY)
+
+@st.cache_resource
+def get_chat_cache():
+    return ResponseCache()
+
+# Makanan serupa + tanda prediksi kurang yakin (tanpa indeks embedding hanya dari skor kepercayaan)
+def nilai_prediksi(prediction, predicted_class, confidence):
+    if embedding_index is not None and prediction.get('embedding') is not None:
+        with tracer.span("similar"):
+            return embedding_index.assess(prediction['embedding'], predicted_class, confidence)
+    reasons = ["skor kepercayaan rendah"] if confidence < LOW_CONFIDENCE_THRESHOLD else []
+    return {'similar': [], 'low_confidence': bool(reasons), 'reasons': reasons}
+
+# Status kesiapan model
+if engine.load_error is not None:
+    st.sidebar.error(f"Model gagal dimuat: {engine.load_error}")
+elif engine.ready.is_set():
+    st.sidebar.caption(f"✅ Model siap (dimuat dalam {engine.timings['total_s']:.1f} detik)")
+else:
+    st.sidebar.caption("⏳ Model sedang dimuat di latar belakang...")
+
+embedding_index = None
+if MODEL_BACKEND == "keras":
+    try:
+        embedding_index = get_embedding_index()
+    except EmbeddingIndexError as e:
+        st.sidebar.warning(str(e))
 
 # === Sidebar Chatbot Gizi ===
 st.sidebar.header("🧠 Chatbot Gizi (Gemini)")
-translated_names = [f"{translate_food_name(name)} ({name.replace('_', ' ').title()})" for name in class_names]
-selected_combined = st.sidebar.selectbox("Pilih makanan:", translated_names, placeholder="Pilih Dari 100 Makanan Berikut")
+translated_names = [f"{registry.translate(name)} ({registry.english(name)})" for name in class_names]
+selected_combined = st.sidebar.selectbox("Pilih makanan:", translated_names, placeholder=f"Pilih Dari {len(registry)} Makanan Berikut")
 selected_food = class_names[translated_names.index(selected_combined)]
 porsi = 100
 user_q = st.sidebar.text_area("Tanyakan sesuatu:", placeholder="Contoh: Apakah ini cocok untuk penderita kolesterol?")
 tanya = st.sidebar.button("Tanya Chatbot")
 
-# Fungsi skala nutrisi berdasarkan berat porsi
-def skala_nutrisi(data_100g, gram):
-    faktor = gram / 100
-
-    def to_float(x):
-        try:
-            return float(x)
-        except:
-            return 0.0
-
-    return {
-        'calories': to_float(data_100g.get('calories')) * faktor,
-        'fat_total_g': to_float(data_100g.get('fat_total_g')) * faktor,
-        'fat_saturated_g': to_float(data_100g.get('fat_saturated_g')) * faktor,
-        'sodium_mg': to_float(data_100g.get('sodium_mg')) * faktor,
-        'potassium_mg': to_float(data_100g.get('potassium_mg')) * faktor,
-        'cholesterol_mg': to_float(data_100g.get('cholesterol_mg')) * faktor,
-        'carbohydrates_total_g': to_float(data_100g.get('carbohydrates_total_g')) * faktor,
-        'fiber_g': to_float(data_100g.get('fiber_g')) * faktor,
-        'sugar_g': to_float(data_100g.get('sugar_g')) * faktor,
-    }
-
-# Fungsi menghitung batas sehat berdasarkan porsi
-
-def hitung_batas_sehat(gram):
-    faktor = gram / 100
-    return {
-        'fat_total_g': 11 * faktor,
-        'fat_saturated_g': 4 * faktor,
-        'sodium_mg': 333 * faktor,
-        'cholesterol_mg': 50 * faktor,
-        'sugar_g': 8 * faktor
-    }
+def tampilkan_jawaban(placeholder, text):
+    placeholder.markdown(f"""
+        <div style='text-align: justify;'>{text}</div>
+    """, unsafe_allow_html=True)
 
 if tanya and user_q:
-    query_food = selected_food.replace('_', ' ')
-    url = f"https://api.api-ninjas.com/v1/nutrition?query={query_food}"
-    headers = {'X-Api-Key': NUTRITION_API_KEY}
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200 and response.json():
-        gizi_100g = response.json()[0]
-        gizi = skala_nutrisi(gizi_100g, porsi)
-        batas = hitung_batas_sehat(porsi)
-
-        # Buat baris gizi dinamis
-        gizi_lines = []
-        if gizi['fat_total_g']: gizi_lines.append(f"- Lemak total: {gizi['fat_total_g']:.2f} g")
-        if gizi['fat_saturated_g']: gizi_lines.append(f"- Lemak jenuh: {gizi['fat_saturated_g']:.2f} g")
-        if gizi['sodium_mg']: gizi_lines.append(f"- Natrium: {gizi['sodium_mg']:.2f} mg")
-        if gizi['potassium_mg']: gizi_lines.append(f"- Kalium: {gizi['potassium_mg']:.2f} mg")
-        if gizi['cholesterol_mg']: gizi_lines.append(f"- Kolesterol: {gizi['cholesterol_mg']:.2f} mg")
-        if gizi['carbohydrates_total_g']: gizi_lines.append(f"- Karbohidrat: {gizi['carbohydrates_total_g']:.2f} g")
-        if gizi['fiber_g']: gizi_lines.append(f"- Serat: {gizi['fiber_g']:.2f} g")
-        if gizi['sugar_g']: gizi_lines.append(f"- Gula: {gizi['sugar_g']:.2f} g")
-
-        batas_lines = [
-            f"- Lemak total < {batas['fat_total_g']:.2f} g",
-            f"- Lemak jenuh < {batas['fat_saturated_g']:.2f} g",
-            f"- Natrium < {batas['sodium_mg']:.2f} mg",
-            f"- Kolesterol < {batas['cholesterol_mg']:.2f} mg",
-            f"- Gula < {batas['sugar_g']:.2f} g"
-        ]
-
-        catatan_pedoman = f"""
-        Catatan Referensi Gizi:
-        - Pedoman Kalori (HaloDoc): Asupan kalori harian standar adalah 2000 kkal.
-        - WHO:
-        - Lemak total: Maks. 30% dari kalori harian (≈ 66.7g)
-        - Lemak jenuh: Maks. 10% dari kalori harian (≈ 22.2g)
-        - Gula: Maks. 10% dari kalori harian (≈ 50g)
-        - Natrium: Maks. 2g (2000 mg) per hari
-        - AHA:
-        - Kolesterol: Maks. 300 mg per hari dan untuk yang mengidap penyakit jantung Maks. 200 mg per hari
-        - UCSF:
-        - Serat: 25–30g per hari
-        - AHA:
-        - Karbohidrat: 45–65% dari total kalori (≈ 225–325g per hari)
-        - WHO:
-        - Kalium: Tidak kurang dari 3.5g per hari
-
-        Parameter batas sehat di bawah ini disesuaikan untuk porsi makanan sebesar {porsi} gram (mengikuti porsi default 100g dari API).
-
-        Tambahan:
-        - Serat dianggap sangat cukup jika > 8g, cukup jika > 4g, dan hampir cukup jika > 2g.
-        - Karbohidrat dianggap sangat cukup jika > 75g, cukup jika > 37.5g, hampir cukup jika > 18.75g.
-        - Kalium dianggap sangat cukup jika > 1167mg, cukup jika > 583mg, hampir cukup jika > 292mg.
-        """
-
-        prompt = f"""
-        Nama makanan: {selected_food.replace('_', ' ').title()}
-        Porsi: {porsi} gram
-
-        Gizi:
-        """ + "\n".join(gizi_lines) + """
-
-        {catatan_pedoman}
-
-        Batas Sehat Berdasarkan Porsi Ini:
-        """ + "\n".join(batas_lines) + f"""
-
-        Pertanyaan pengguna:
-        {user_q}
-
-        Tolong jawab langsung dan relevan dengan pertanyaan pengguna berdasarkan data di atas. Jangan membuat pertanyaan baru atau menjawab terlalu panjang jika tidak diminta. Fokus pada jawaban yang sesuai konteks. Lalu Jika pertanyaannya:
-
-        - Tentang kesehatan → evaluasi berdasarkan 5 parameter utama (lemak total, lemak jenuh, gula, natrium, kolesterol).
-        - Tentang penyakit tertentu → jelaskan relevansi dengan parameter di atas (misal: kolesterol tinggi → perhatikan kolesterol dan lemak jenuh).
-        - Tentang gizi tertentu → jawab dengan nilai spesifik dari data.
-        - Tentang semua gizi → beri ringkasan daftar gizi.
-        - Tentang porsi berlebih → kalikan logika batas sehat per porsi.
-        - Tentang alasan sehat/tidak sehat → berikan alasan langsung berdasarkan yang melebihi batas.
-        - Tentang serat, kalium, karbohidrat → sampaikan sebagai keterangan tambahan saja.
-        - Jika pengguna menyebut berat porsi lain (selain 100g), sesuaikan dengan logika proporsional.
-        """
+    with tracer.trace("chatbot"):
+        with tracer.span("chat_cache"):
+            chat_key = cache_key(selected_food, user_q, porsi)
+            cached_answer = get_chat_cache().get(chat_key)
 
         try:
-            gemini_model = get_gemini_model()
-            gemini_response = gemini_model.generate_content(prompt)
+            with tracer.span("nutrition"):
+                gizi_100g = get_nutrition_store().get(selected_food) if cached_answer is None else None
+        except NutritionError:
+            gizi_100g = None
+
+        if cached_answer is not None:
             st.sidebar.markdown("**🧠 Jawaban Chatbot:**")
-            st.sidebar.markdown(f"""
-                <div style='text-align: justify;'>{gemini_response.text}</div>
-            """, unsafe_allow_html=True)
-        except Exception as e:
-            st.sidebar.error(f"Gagal memanggil Gemini API: {e}")
-    else:
-        st.sidebar.error("Gagal mengambil data dari API Ninjas")
+            tampilkan_jawaban(st.sidebar.empty(), cached_answer)
+        elif gizi_100g:
+            with tracer.span("prompt"):
+                prompt = build_prompt(selected_food, porsi, score_food(gizi_100g, porsi), user_q)
+
+            try:
+                gemini_model = get_gemini_model()
+                st.sidebar.markdown("**🧠 Jawaban Chatbot:**")
+                placeholder = st.sidebar.empty()
+                answer = ""
+                # Tampilkan jawaban sedikit demi sedikit begitu token diterima
+                with tracer.span("gemini"):
+                    gemini_start = time.perf_counter()
+                    for chunk in stream_answer(gemini_model, get_chat_cache(), chat_key, prompt):
+                        if not answer:
+                            tracer.record("gemini_first_token", time.perf_counter() - gemini_start)
+                        answer += chunk
+                        tampilkan_jawaban(placeholder, answer + " ▌")
+                tampilkan_jawaban(placeholder, answer)
+            except Exception as e:
+                st.sidebar.error(f"Gagal memanggil Gemini API: {e}")
+        else:
+            st.sidebar.error("Gagal mengambil data dari API Ninjas")
 
 # Menyiapkan antarmuka Streamlit
 st.title('Website Klasifikasi Makanan dan Informasi Nutrisi Berbasis Machine Learning')
@@ -239,69 +211,57 @@ if st.button("Ayo Mulai Mengklasifikasi"):
 
 st.divider() 
 
-# Fungsi untuk resize gambar agar ukurannya seragam
-def resize_image(image_path, size=(300, 300)):
-    img = Image.open(image_path)
-    img = img.resize(size, Image.LANCZOS)
-    return img
-
-# Fungsi untuk mencari semua gambar dalam folder
-def find_images_in_folder(folder):
-    image_paths = []
-    for root, dirs, files in os.walk(folder):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                image_paths.append(os.path.join(root, file))
-    return sorted(image_paths)
+# Cache thumbnail 300x300 di disk + LRU di memori, dibagi ke semua sesi
+@st.cache_resource
+def get_thumbnail_cache():
+    return ThumbnailCache(size=(300, 300))
 
 # Fungsi untuk menampilkan gambar dalam grid dengan scroll
-def display_image_grid(image_paths, labels, columns=4):
+# Hanya tile pada halaman yang aktif yang di-encode dan dikirim ke browser.
+# Dibungkus st.fragment supaya ganti halaman tidak menjalankan ulang seluruh skrip.
+@st.fragment
+def display_image_grid(image_paths, labels, columns=4, page_size=None):
     num_images = len(image_paths)
-    num_rows = -(-num_images // columns)  # Ceiling division to calculate the number of rows
+    if not page_size or page_size >= num_images:
+        page_size = max(num_images, 1)
+    num_pages = -(-num_images // page_size)  # Ceiling division to calculate the number of pages
+
+    page = 1
+    if num_pages > 1:
+        page = st.number_input("Halaman galeri", min_value=1, max_value=num_pages, value=1, step=1, key="gallery_page")
+    start = (page - 1) * page_size
+    end = min(start + page_size, num_images)
+    page_paths = image_paths[start:end]
+    page_labels = labels[start:end]
+    num_rows = -(-len(page_paths) // columns)  # Ceiling division to calculate the number of rows
     
     with st.container():  # Container for scrolling
         # Create a scrollable grid
         st.write("<style>.scrollable-container { overflow: auto; }</style>", unsafe_allow_html=True)
         st.markdown('<div class="scrollable-container">', unsafe_allow_html=True)
         
+        thumbnails = get_thumbnail_cache().get_many(page_paths)
         for i in range(num_rows):
             cols = st.columns(columns)
             for j in range(columns):
                 index = i * columns + j
-                if index < num_images:
+                if index < len(page_paths):
                     with cols[j]:
-                        resized_img = resize_image(image_paths[index])
-                        st.image(resized_img, caption=labels[index], use_column_width=True)
+                        st.image(thumbnails[index], caption=page_labels[index], use_column_width=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
+        if num_pages > 1:
+            st.caption(f"Menampilkan {start + 1}–{end} dari {num_images} makanan (halaman {page} dari {num_pages})")
 
-# Cari semua gambar di folder 'food_images'
-image_folder = 'food_images'
-image_paths = find_images_in_folder(image_folder)
-labels = [
-    'Pai Apel (Apple Pie)', 'Iga Punggung (Baby Back Ribs)', 'Baklava', 'Tartar Daging Sapi (Beef Tartare)', 'Salad Bit (Beet Salad)', 
-    'Roti Goreng Prancis (Beignet)', 'Bibimbap', 'Puding Roti (Bread Pudding)', 'Burrito Sarapan (Breakfast Burrito)', 'Bruschetta', 'Salad Caesar (Caesar Salad)', 'Calamari', 'Cannoli', 
-    'Salad Caprese (Caprese Salad)', 'Spageti Carbonara (Carbonara)', 'Carpaccio', 'Kue Wortel (Carrot Cake)', 'Ceviche', 'Kue Keju (Cheesecake)', 
-    'Piring Keju (Cheese Plate)', 'Kari Ayam (Chicken Curry)', 'Quesadilla Ayam (Chicken Quesadilla)', 
-    'Sayap Ayam (Chicken Wings)', 'Kue Coklat (Chocolate Cake)', 'Coklat Mousse (Chocolate Mousse)', 'Churros', 'Sup Krim Kerang (Clam Chowder)', 
-    'Sandwich Klub (Club Sandwich)', 'Kue Kepiting (Crab Cakes)', 'Creme Brulee', 'Kue Cangkir (Cup Cakes)', 'Telur Isi (Deviled Eggs)', 
-    'Donat (Donuts)', 'Pangsit (Dumplings)', 'Kedelai Jepang (Edamame)', 'Telur Benedict (Eggs Benedict)', 
-    'Siput (Escargots)', 'Falafel', 'Daging Sapi Filet (Filet Mignon)', 'Ikan Dan Kentang Goreng (Fish And Chips)', 'Foie Gras',
-    'Kentang Goreng (French Fries)', 'Sup Bawang Prancis (French Onion Soup)', 'Roti Panggang Prancis (French Toast)', 'Ayam Goreng (Fried Chicken)', 'Ikan Goreng (Fried Fish)',
-    'Nasi Goreng (Fried Rice)', 'Yogurt Beku (Frozen Yogurt)', 'Roti Bawang Putih (Garlic Bread)', 'Gnocchi', 'Salad Yunani (Greek Salad)', 'Sandwich Keju Panggang (Grilled Cheese Sandwich)', 'Salmon Panggang (Grilled Salmon)',
-    'Guacamole', 'Gyoza', 'Hamburger', 'Sup Asam Pedas (Hot And Sour Soup)', 'Hot Dog', 'Huevos Rancheros', 'Hummus', 'Es Krim (Ice Cream)', 
-    'Lasagna', 'Lobster Bisque', 'Makaroni Dan Keju (Macaroni And Cheese)', 'Makaron (Macarons)', 
-    'Sup Miso (Miso Soup)', 'Kerang (Mussels)', 'Nachos', 'Omelet (Omelette)', 'Cincin Bawang (Onion Rings)', 'Tiram (Oysters)', 
-    'Pad Thai', 'Paella', 'Panekuk (Pancakes)', 'Panna Cotta', 'Bebek Peking (Peking Duck)', 'Pho', 'Pizza', 'Potongan Daging Babi (Pork Chop)',
-    'Poutine', 'Iga Utama (Prime Rib)', 'Sandwich Babi Suwir (Pulled Pork Sandwich)', 'Ramen', 'Ravioli', 'Rendang', 'Risotto', 
-    'Samosa', 'Sashimi', 'Sate (Satay)', 'Simping (Scallops)', 'Salad Rumput Laut (Seaweed Salad)', 'Udang Dan Bubur Jagung (Shrimp And Grits)', 
-    'Spageti Bolognese (Spaghetti Bolognese)', 'Lumpia (Spring Rolls)', 'Steak', 'Kue Stroberi (Strawberry Shortcake)', 
-    'Sushi', 'Tacos', 'Tiramisu', 'Wafel (Waffles)'
-]
+# Gambar dan label galeri diambil dari daftar kelas, jadi keduanya selalu berpasangan
+gallery = [(registry.image_path(name), registry.display_label(name)) for name in class_names
+           if registry.image_path(name) and os.path.exists(registry.image_path(name))]
+image_paths = [path for path, _ in gallery]
+labels = [label for _, label in gallery]
 
 # Menampilkan grid gambar
 st.title('Daftar Makanan yang Dapat Diklasifikasikan')
-display_image_grid(image_paths, labels, columns=4)
+display_image_grid(image_paths, labels, columns=GALLERY_COLUMNS, page_size=GALLERY_PAGE_SIZE)
 
 # Menambahkan garis pemisah
 st.divider()  # Atau bisa juga menggunakan st.markdown("---")
@@ -354,7 +314,8 @@ st.divider()  # Atau bisa juga menggunakan st.markdown("---")
 st.subheader('Skor Kepercayaan:')
 st.write("""
 Skor kepercayaan mewakili probabilitas bahwa prediksi model AI benar. 
-Skor kepercayaan yang lebih tinggi berarti model lebih yakin tentang prediksinya.
+Skor kepercayaan yang lebih tinggi berarti model lebih yakin tentang prediksinya. Prediksi dengan skor rendah, 
+atau yang gambarnya lebih mirip dengan makanan lain di gambar referensi, ditandai agar dicek kembali.
 """)
 
 st.subheader('Cara Menggunakan:')
@@ -368,103 +329,209 @@ st.write("""
 uploaded_file = st.file_uploader("Pilih gambar makanan...", type=["jpg", "png"])
 
 if uploaded_file is not None:
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        image = load_img(uploaded_file, target_size=(224, 224))
-        st.image(image, caption='Gambar yang diunggah.', use_column_width=True)
-    
-        # Priproses gambar
-        image = img_to_array(image) / 255.0
-        image = np.expand_dims(image, axis=0)
+    with tracer.trace("upload"):
+        col1, col2 = st.columns([1, 1])
     
-        # Prediksi kelas gambar
-        prediction = model.predict(image)
-        predicted_class = class_names[np.argmax(prediction)]
-        confidence = float(np.max(prediction))
+        with col1:
+            image_bytes = uploaded_file.getvalue()
+            st.image(image_bytes, caption='Gambar yang diunggah.', use_column_width=True)
+
+            with tracer.span("prediction_cache"):
+                image_digest = hash_image_bytes(image_bytes)
+                cached_prediction = get_prediction_cache().get(image_digest)
+            if cached_prediction is None:
+                # Priproses gambar (normalisasi sama dengan saat pelatihan MobileNetV2)
+                with tracer.span("preprocess"):
+                    image = preprocess_image(io.BytesIO(image_bytes))
+                    image = np.expand_dims(image, axis=0)
         
-        # Tampilkan prediksi dan kepercayaan di bawah gambar
-        st.write(f'Prediksi: {translate_food_name(predicted_class).replace("_", " ")}')
-        st.write(f'Skor Kepercayaan: {confidence * 100:.2f}%')
+                # Prediksi kelas gambar
+                if not engine.ready.is_set():
+                    with st.spinner("Model sedang disiapkan, mohon tunggu..."), tracer.span("model_wait"):
+                        engine.ready.wait()
+                if engine.load_error is not None:
+                    st.error(f"Model gagal dimuat, prediksi tidak dapat dilakukan: {engine.load_error}")
+                    st.stop()
+                try:
+                    with tracer.span("predict"):
+                        probabilities, embedding = split_prediction(engine.submit(image[0]).result())
+                except ServerBusy:
+                    st.error("Server inferensi sedang sibuk, silakan coba lagi sebentar lagi.")
+                    st.stop()
+                except (OSError, EOFError) as e:
+                    st.error(f"Server inferensi tidak dapat dihubungi: {e}")
+                    st.stop()
+                cached_prediction = get_prediction_cache().put(image_digest, probabilities, embedding)
+
+            class_index, confidence = cached_prediction['top_k'][0]
+            predicted_class = class_names[class_index]
         
-    with col2:
-        # Tampilkan informasi nutrisi dan status kesehatan dengan teks lebih besar dan tebal
-        st.markdown(f"**<h3>Informasi Nutrisi:</h3>**", unsafe_allow_html=True)
+            # Tampilkan prediksi dan kepercayaan di bawah gambar
+            st.write(f'Prediksi: {registry.translate(predicted_class).replace("_", " ")}')
+            st.write(f'Skor Kepercayaan: {confidence * 100:.2f}%')
+
+            penilaian = nilai_prediksi(cached_prediction, predicted_class, confidence)
+            if penilaian['low_confidence']:
+                st.warning(f"Prediksi kurang yakin ({', '.join(penilaian['reasons'])}). Periksa kembali hasilnya.")
         
-        url = f'https://api.api-ninjas.com/v1/nutrition?query={predicted_class.replace("_", " ")}'
-        headers = {'X-Api-Key': NUTRITION_API_KEY}
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            nutrition_data = response.json()
-            if nutrition_data:
-                nutrition_info = nutrition_data[0]
-                st.write(f"Lemak Total (g): {nutrition_info.get('fat_total_g', 'N/A')}")
-                st.write(f"Lemak Jenuh (g): {nutrition_info.get('fat_saturated_g', 'N/A')}")
-                st.write(f"Natrium (mg): {nutrition_info.get('sodium_mg', 'N/A')}")
-                st.write(f"Kalium (mg): {nutrition_info.get('potassium_mg', 'N/A')}")
-                st.write(f"Kolesterol (mg): {nutrition_info.get('cholesterol_mg', 'N/A')}")
-                st.write(f"Karbohidrat Total (g): {nutrition_info.get('carbohydrates_total_g', 'N/A')}")
-                st.write(f"Serat (g): {nutrition_info.get('fiber_g', 'N/A')}")
-                st.write(f"Gula (g): {nutrition_info.get('sugar_g', 'N/A')}")
-
-                # Perhitungan status kesehatan
-                fat_total = float(nutrition_info.get('fat_total_g', 0))
-                fat_saturated = float(nutrition_info.get('fat_saturated_g', 0))
-                sodium = float(nutrition_info.get('sodium_mg', 0))
-                potassium = float(nutrition_info.get('potassium_mg', 0))
-                cholesterol = float(nutrition_info.get('cholesterol_mg', 0))
-                carbohydrates = float(nutrition_info.get('carbohydrates_total_g', 0))
-                fiber = float(nutrition_info.get('fiber_g', 0))
-                sugar = float(nutrition_info.get('sugar_g', 0))
-                
-                # Kondisi kesehatan
-                health_status = (fat_total < 11 and fat_saturated < 3.5 and sodium < 333 and cholesterol < 50 and sugar < 8)
-                
-                # Alasan jika makanan tidak sehat
-                reasons = []
-                if fat_total >= 11:
-                    reasons.append("Lemak Total")
-                if fat_saturated >= 3.5:
-                    reasons.append("Lemak Jenuh")
-                if sodium >= 333:
-                    reasons.append("Natrium")
-                if cholesterol >= 50:
-                    reasons.append("Kolesterol")
-                if sugar >= 8:
-                    reasons.append("Gula")
+        with col2:
+            # Tampilkan informasi nutrisi dan status kesehatan dengan teks lebih besar dan tebal
+            st.markdown(f"**<h3>Informasi Nutrisi:</h3>**", unsafe_allow_html=True)
+        
+            try:
+                with tracer.span("nutrition"):
+                    nutrition_data = get_nutrition_store().lookup(predicted_class)
+                nutrition_error = None
+            except NutritionError as e:
+                nutrition_data = None
+                nutrition_error = e
+
+            if nutrition_error is None:
+                if nutrition_data:
+                    nutrition_info = nutrition_data[0]
+                    st.write(f"Lemak Total (g): {nutrition_info.get('fat_total_g', 'N/A')}")
+                    st.write(f"Lemak Jenuh (g): {nutrition_info.get('fat_saturated_g', 'N/A')}")
+                    st.write(f"Natrium (mg): {nutrition_info.get('sodium_mg', 'N/A')}")
+                    st.write(f"Kalium (mg): {nutrition_info.get('potassium_mg', 'N/A')}")
+                    st.write(f"Kolesterol (mg): {nutrition_info.get('cholesterol_mg', 'N/A')}")
+                    st.write(f"Karbohidrat Total (g): {nutrition_info.get('carbohydrates_total_g', 'N/A')}")
+                    st.write(f"Serat (g): {nutrition_info.get('fiber_g', 'N/A')}")
+                    st.write(f"Gula (g): {nutrition_info.get('sugar_g', 'N/A')}")
+
+                    # Perhitungan status kesehatan
+                    skor = score_food(nutrition_info)
                     
-                if health_status:
-                    st.markdown(f"**<h3>Status Kesehatan: Sehat</h3>**", unsafe_allow_html=True)
-                else:
-                    reason_text = ", ".join(reasons)
-                    st.markdown(f"**<h3>Status Kesehatan: Tidak Sehat</h3>**", unsafe_allow_html=True)
-                    st.write(f"{reason_text} dalam makanan ini telah melewati batas dari parameter kesehatan, Sehingga dianggap tidak sehat.")
+                    if skor['healthy']:
+                        st.markdown(f"**<h3>Status Kesehatan: Sehat</h3>**", unsafe_allow_html=True)
+                    else:
+                        reason_text = ", ".join(skor['reasons'])
+                        st.markdown(f"**<h3>Status Kesehatan: Tidak Sehat</h3>**", unsafe_allow_html=True)
+                        st.write(f"{reason_text} dalam makanan ini telah melewati batas dari parameter kesehatan, Sehingga dianggap tidak sehat.")
                 
-                # Keterangan tambahan
-                if fiber > 8:
-                    st.write("Serat pada makanan ini sudah sangat cukup untuk kebutuhan sehari-hari.")
-                elif fiber > 4:
-                    st.write("Serat pada makanan ini sudah cukup untuk kebutuhan sehari-hari.")
-                elif fiber > 2:
-                    st.write("Serat pada makanan ini hampir cukup untuk kebutuhan sehari-hari.")
-                    
-                if carbohydrates > 75:
-                    st.write("Karbohidrat pada makanan ini sudah sangat cukup untuk kebutuhan sehari-hari.")
-                elif carbohydrates > 37.5:
-                    st.write("Karbohidrat pada makanan ini sudah cukup untuk kebutuhan sehari-hari.")
-                elif carbohydrates > 18.75:
-                    st.write("Karbohidrat pada makanan ini hampir cukup untuk kebutuhan sehari-hari.")
-                    
-                if potassium > 1167:
-                    st.write("Kalium pada makanan ini sudah sangat cukup untuk kebutuhan sehari-hari.")
-                elif potassium > 583:
-                    st.write("Kalium pada makanan ini sudah cukup untuk kebutuhan sehari-hari.")
-                elif potassium > 292:
-                    st.write("Kalium pada makanan ini hampir cukup untuk kebutuhan sehari-hari.")
+                    # Keterangan tambahan (serat, karbohidrat, kalium)
+                    for label, tier in skor['tiers'].items():
+                        if tier == 'hampir cukup':
+                            st.write(f"{label} pada makanan ini hampir cukup untuk kebutuhan sehari-hari.")
+                        elif tier is not None:
+                            st.write(f"{label} pada makanan ini sudah {tier} untuk kebutuhan sehari-hari.")
                 
+                else:
+                    st.markdown(f"**<h3>Tidak ada informasi nutrisi yang ditemukan.</h3>**", unsafe_allow_html=True)
             else:
-                st.markdown(f"**<h3>Tidak ada informasi nutrisi yang ditemukan.</h3>**", unsafe_allow_html=True)
+                st.write(str(nutrition_error))
+            st.markdown("</div>", unsafe_allow_html=True)
+
+        # Gambar referensi yang paling mirip (dari indeks embedding, tanpa model kedua)
+        if penilaian['similar']:
+            st.markdown("**Makanan Serupa:**")
+            similar_cols = st.columns(len(penilaian['similar']))
+            for col, neighbor in zip(similar_cols, penilaian['similar']):
+                with col:
+                    if os.path.exists(neighbor['path']):
+                        st.image(get_thumbnail_cache().get(neighbor['path']), use_column_width=True)
+                    st.caption(f"{registry.translate(neighbor['label'])} ({neighbor['similarity'] * 100:.0f}% mirip)")
+
+st.divider()
+
+# === Mode klasifikasi banyak gambar ===
+st.subheader('Klasifikasi Banyak Gambar:')
+st.write("""
+Unggah beberapa gambar sekaligus atau satu file zip berisi gambar makanan. Gambar diproses secara paralel dan 
+hasilnya ditampilkan di tabel begitu selesai, lalu dapat diunduh sebagai CSV.
+""")
+
+bulk_files = st.file_uploader("Pilih gambar atau file zip...", type=["jpg", "png", "zip"], accept_multiple_files=True)
+
+if bulk_files and st.button("Klasifikasi Semua"):
+    with tracer.trace("bulk"):
+        if not engine.ready.is_set():
+            with st.spinner("Model sedang disiapkan, mohon tunggu..."), tracer.span("model_wait"):
+                engine.ready.wait()
+        if engine.load_error is not None:
+            st.error(f"Model gagal dimuat, prediksi tidak dapat dilakukan: {engine.load_error}")
+            st.stop()
+
+        with tracer.span("unpack"):
+            items = list(iter_uploaded_images(bulk_files))
+        progress = st.progress(0.0, text=f"0 dari {len(items)} gambar")
+        table = st.empty()
+        rows = []
+        bulk_start = time.perf_counter()
+        for name, prediction, error in classify_images(items, engine, get_prediction_cache()):
+            row = {'File': name}
+            if error is not None:
+                row['Prediksi'] = f"Gagal: {error}"
+            else:
+                class_index, confidence = prediction['top_k'][0]
+                predicted_class = class_names[class_index]
+                row['Prediksi'] = registry.translate(predicted_class)
+                row['Kepercayaan (%)'] = round(confidence * 100, 2)
+                penilaian = nilai_prediksi(prediction, predicted_class, confidence)
+                row['Perlu Dicek'] = ", ".join(penilaian['reasons']) if penilaian['low_confidence'] else "Tidak"
+                try:
+                    with tracer.span("nutrition"):
+                        nutrition_info = get_nutrition_store().get(predicted_class)
+                except NutritionError:
+                    nutrition_info = None
+                if nutrition_info:
+                    row.update({
+                        'Lemak Total (g)': nutrition_info.get('fat_total_g', 'N/A'),
+                        'Lemak Jenuh (g)': nutrition_info.get('fat_saturated_g', 'N/A'),
+                        'Natrium (mg)': nutrition_info.get('sodium_mg', 'N/A'),
+                        'Kalium (mg)': nutrition_info.get('potassium_mg', 'N/A'),
+                        'Kolesterol (mg)': nutrition_info.get('cholesterol_mg', 'N/A'),
+                        'Karbohidrat Total (g)': nutrition_info.get('carbohydrates_total_g', 'N/A'),
+                        'Serat (g)': nutrition_info.get('fiber_g', 'N/A'),
+                        'Gula (g)': nutrition_info.get('sugar_g', 'N/A'),
+                    })
+                    skor = score_food(nutrition_info)
+                    row['Status Kesehatan'] = "Sehat" if skor['healthy'] else "Tidak Sehat"
+                    row['Alasan'] = ", ".join(skor['reasons'])
+                else:
+                    row['Status Kesehatan'] = "Tidak ada informasi nutrisi"
+            rows.append(row)
+            progress.progress(len(rows) / len(items), text=f"{len(rows)} dari {len(items)} gambar")
+            table.dataframe(pd.DataFrame(rows), use_container_width=True)
+        tracer.record("bulk_classify", time.perf_counter() - bulk_start)
+
+        if rows:
+            st.download_button(
+                "Unduh Hasil (CSV)",
+                pd.DataFrame(rows).to_csv(index=False).encode('utf-8'),
+                file_name="hasil_klasifikasi.csv",
+                mime="text/csv",
+            )
         else:
-            st.write(f"Gagal mengambil informasi nutrisi: {response.status_code}")
-        st.markdown("</div>", unsafe_allow_html=True)
+            st.write("Tidak ada gambar jpg/png yang ditemukan.")
+
+# === Panel debug ===
+if DEBUG_PANEL:
+    st.divider()
+    with st.expander("🔧 Panel Debug: Durasi Tahap"):
+        if tracer.recent_traces:
+            last_trace = tracer.recent_traces[-1]
+            st.write(f"Permintaan terakhir ({last_trace.flow}): {last_trace.total_s * 1000:.1f} ms")
+            st.dataframe(pd.DataFrame(
+                [{'Tahap': stage, 'Durasi (ms)': round(duration * 1000, 2), 'Status': status}
+                 for stage, duration, status in last_trace.spans]
+            ), use_container_width=True)
+        st.write("Histogram per tahap:")
+        st.dataframe(pd.DataFrame(tracer.summary()), use_container_width=True)
+        server_health = None
+        if isinstance(engine.model, RemoteModel):
+            try:
+                server_health = engine.model.health()
+            except (OSError, EOFError) as e:
+                server_health = {'ok': False, 'error': str(e)}
+        st.write("Statistik komponen:")
+        st.json({
+            'model': engine.timings,
+            'inference': engine.stats(),
+            'prediction_cache': get_prediction_cache().stats(),
+            'embedding_index': {'size': len(embedding_index), 'ivf': embedding_index.centroids is not None}
+                               if embedding_index is not None else None,
+            'chat_cache': get_chat_cache().stats(),
+            'http': get_shared_client().stats(),
+            'inference_server': server_health,
+        })
+        st.download_button("Unduh Metrik (Prometheus)", tracer.prometheus_text(), file_name="metrics.prom", mime="text/plain")
@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # batas waktu total per panggilan (detik)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "8"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class DeadlineExceeded(requests.Timeout):
+    pass
+
+
+# Circuit breaker sederhana: terbuka setelah `threshold` kegagalan beruntun,
+# lalu setelah `cooldown` detik satu panggilan percobaan diizinkan (half-open).
+class CircuitBreaker:
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+# Client HTTP bersama: connection pool + keep-alive, deadline per panggilan,
+# retry terbatas dengan backoff + jitter, circuit breaker, dan batas konkurensi.
+class HttpClient:
+    def __init__(self, timeout=HTTP_TIMEOUT, max_retries=HTTP_MAX_RETRIES, max_concurrency=HTTP_MAX_CONCURRENCY,
+                 backoff_base=0.2, backoff_max=2.0, breaker=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'rejected': 0,
+            'latency_total_s': 0.0,
+            'latency_max_s': 0.0,
+        }
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
+
+    def _record_latency(self, elapsed):
+        with self._stats_lock:
+            self._stats['latency_total_s'] += elapsed
+            self._stats['latency_max_s'] = max(self._stats['latency_max_s'], elapsed)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['latency_avg_s'] = stats['latency_total_s'] / stats['requests'] if stats['requests'] else 0.0
+        stats['circuit'] = self.breaker.state
+        return stats
+
+    def _backoff(self, attempt):
+        # Full jitter: acak antara 0 dan batas eksponensial
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # Satu panggilan logis = satu kegagalan/keberhasilan di circuit breaker, berapa pun jumlah retry-nya
+    def request(self, method, url, timeout=None, **kwargs):
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        if not self.breaker.allow():
+            self._count(rejected=1)
+            raise CircuitOpenError(f"Circuit terbuka untuk {url}, coba lagi nanti")
+        try:
+            response = self._request_with_retries(method, url, deadline, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code in RETRY_STATUS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _request_with_retries(self, method, url, deadline, **kwargs):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Batas waktu habis untuk {url}")
+
+            if not self._slots.acquire(timeout=remaining):
+                self._count(rejected=1)
+                raise DeadlineExceeded(f"Terlalu banyak panggilan bersamaan ke {url}")
+            start = time.monotonic()
+            try:
+                remaining = max(deadline - start, 0.001)
+                response = self.session.request(method, url, timeout=remaining, **kwargs)
+                error = None
+            except requests.RequestException as e:
+                response = None
+                error = e
+            finally:
+                self._slots.release()
+                elapsed = time.monotonic() - start
+                self._count(requests=1)
+                self._record_latency(elapsed)
+
+            retryable = error is not None or response.status_code in RETRY_STATUS
+            if not retryable:
+                return response
+
+            self._count(errors=1)
+            sleep = self._backoff(attempt)
+            if attempt >= self.max_retries or time.monotonic() + sleep >= deadline:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            attempt += 1
+            self._count(retries=1)
+            time.sleep(sleep)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+# Satu instance per proses supaya pool koneksi dan statistik dipakai bersama
+def get_shared_client():
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
@@ -0,0 +1,234 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from class_registry import CLASS_REGISTRY_PATH, load_registry
+from preprocessing import IMAGE_EXTENSIONS, PREPROCESSING_VERSION, BatchBuffer
+from tflite_backend import KERAS_MODEL_PATH
+
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", "features")
+MAX_IMAGES_PER_CLASS = int(os.getenv("MAX_IMAGES_PER_CLASS", "100"))
+VALIDATION_SPLIT = 0.2
+
+
+# Backbone beku: model lengkap dipotong di input layer klasifikasi (embedding Dense 128)
+def embedding_extractor(model):
+    import tensorflow as tf
+
+    return tf.keras.Model(model.inputs, model.layers[-1].input)
+
+
+def class_images(folder, limit=MAX_IMAGES_PER_CLASS):
+    if not os.path.isdir(folder):
+        return []
+    files = sorted(file for file in os.listdir(folder) if file.lower().endswith(IMAGE_EXTENSIONS))
+    return [os.path.join(folder, file) for file in files[:limit]]
+
+
+# Identitas backbone dari isi bobotnya. Model inkremental memakai backbone yang sama persis
+# sehingga fiturnya tetap terpakai, sedangkan model yang di-fine-tune ulang mendapat identitas baru.
+def backbone_digest(extractor):
+    digest = hashlib.sha256()
+    for weights in extractor.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+
+# Hash daftar file (path + ukuran + mtime), jadi file yang diganti dengan nama sama juga terdeteksi
+def _paths_digest(paths):
+    entries = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        entries.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(entries).encode('utf-8')).hexdigest()[:16]
+
+
+# Fitur per kelas disimpan sebagai features/<kelas>--<hash daftar file>.npy (float16) sehingga
+# kelas lama cukup diekstrak sekali. Cache dikosongkan jika backbone atau praproses berubah.
+class FeatureCache:
+    def __init__(self, extractor, cache_dir=FEATURE_CACHE_DIR, batch_size=32, model_path=None):
+        self.extractor = extractor
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path = os.path.join(cache_dir, 'meta.json')
+        meta = {'preprocessing': PREPROCESSING_VERSION, 'dim': int(extractor.output.shape[-1]),
+                'backbone': backbone_digest(extractor)}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                previous = json.load(f)
+            if {key: previous.get(key) for key in meta} != meta:
+                # Backbone, praproses, atau dimensi berubah: fitur lama tidak bisa dipakai
+                shutil.rmtree(cache_dir)
+                os.makedirs(cache_dir)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, model=model_path), f)
+
+    def get(self, name, paths):
+        path = os.path.join(self.cache_dir, f"{name}--{_paths_digest(paths)}.npy")
+        if os.path.exists(path):
+            return np.load(path).astype(np.float32)
+        # Daftar file kelas ini berubah: buang fitur lama kelas tersebut
+        for stale in glob.glob(os.path.join(glob.escape(self.cache_dir), f"{glob.escape(name)}--*.npy")):
+            os.remove(stale)
+        features = np.empty((len(paths), int(self.extractor.output.shape[-1])), dtype=np.float32)
+        buffer = BatchBuffer(self.batch_size)
+        for i in range(0, len(paths), self.batch_size):
+            chunk = paths[i:i + self.batch_size]
+            features[i:i + len(chunk)] = np.asarray(self.extractor.predict_on_batch(buffer.load(chunk)))
+        np.save(path, features.astype(np.float16))
+        return features
+
+
+# Bobot awal kelas baru = rata-rata embedding kelas tersebut (prototipe), diskalakan ke norma
+# rata-rata bobot kelas lama. Dengan epochs=0 head ini langsung dipakai tanpa pelatihan.
+def imprint_weights(kernel, bias, new_features):
+    scale = float(np.mean(np.linalg.norm(kernel, axis=0)))
+    columns = []
+    for features in new_features:
+        prototype = features.mean(axis=0)
+        columns.append(prototype / max(np.linalg.norm(prototype), 1e-12) * scale)
+    new_kernel = np.concatenate([kernel, np.stack(columns, axis=1)], axis=1)
+    new_bias = np.concatenate([bias, np.full(len(columns), bias.mean(), dtype=bias.dtype)])
+    return new_kernel.astype(np.float32), new_bias.astype(np.float32)
+
+
+def _split(features_by_class):
+    train_x, train_y, val_x, val_y = [], [], [], []
+    for label, features in enumerate(features_by_class):
+        split = int(len(features) * VALIDATION_SPLIT) if len(features) >= 5 else 0
+        val_x.append(features[:split])
+        val_y.append(np.full(split, label))
+        train_x.append(features[split:])
+        train_y.append(np.full(len(features) - split, label))
+    return (np.concatenate(train_x), np.concatenate(train_y)), (np.concatenate(val_x), np.concatenate(val_y))
+
+
+def _accuracy(kernel, bias, features, labels, mask):
+    if not mask.any():
+        return None
+    predicted = np.argmax(features[mask] @ kernel + bias, axis=1)
+    return float(np.mean(predicted == labels[mask]))
+
+
+# Latih hanya layer klasifikasi (Dense softmax di atas embedding beku) dari fitur yang sudah di-cache
+def train_head(features, labels, kernel, bias, epochs=30, learning_rate=1e-3, batch_size=256, seed=0):
+    import tensorflow as tf
+
+    tf.random.set_seed(seed)
+    num_classes = kernel.shape[1]
+    head = tf.keras.Sequential([
+        tf.keras.Input(shape=(kernel.shape[0],)),
+        tf.keras.layers.Dense(num_classes, activation='softmax', name='classifier'),
+    ])
+    head.layers[-1].set_weights([kernel, bias])
+    if epochs:
+        # Bobot kelas seimbang supaya kelas baru dengan sedikit gambar tidak kalah oleh kelas lama
+        counts = np.bincount(labels, minlength=num_classes)
+        class_weight = {i: len(labels) / (num_classes * count) for i, count in enumerate(counts) if count}
+        head.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                     loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+        head.fit(features, labels, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0,
+                 class_weight=class_weight)
+    return head.layers[-1]
+
+
+# Tambah kelas baru tanpa fine-tune penuh: backbone beku, hanya head klasifikasi yang dilatih.
+#   new_classes: [{'name': 'martabak', 'folder': 'data/martabak', 'translation': 'Martabak'}, ...]
+# Model baru disimpan ke `output_model` lalu classes.json diperbarui (kelas baru di akhir).
+def add_classes(new_classes, train_dir='food', registry_path=CLASS_REGISTRY_PATH, output_model=None,
+                max_per_class=MAX_IMAGES_PER_CLASS, epochs=30, learning_rate=1e-3, cache_dir=FEATURE_CACHE_DIR,
+                gallery_dir='food_images'):
+    import tensorflow as tf
+
+    start = time.perf_counter()
+    registry = load_registry(registry_path)
+    model_path = registry.model or KERAS_MODEL_PATH
+    model = tf.keras.models.load_model(model_path)
+    old_count = len(registry)
+    cache = FeatureCache(embedding_extractor(model), cache_dir, model_path=model_path)
+
+    features_by_class, missing = [], []
+    for name in registry.names:
+        paths = class_images(os.path.join(train_dir, name), max_per_class)
+        if not paths:
+            # Tanpa data latih, gambar galeri menjadi satu-satunya contoh supaya kelas lama tidak terlupakan
+            missing.append(name)
+            image = registry.image_path(name)
+            paths = [image] if image and os.path.exists(image) else []
+        if not paths:
+            raise ValueError(f"Tidak ada gambar untuk kelas {name} di {train_dir} maupun galeri")
+        features_by_class.append(cache.get(name, paths))
+    new_paths = []
+    for new_class in new_classes:
+        paths = class_images(new_class['folder'], max_per_class)
+        if not paths:
+            raise ValueError(f"Tidak ada gambar untuk kelas baru {new_class['name']} di {new_class['folder']}")
+        registry.add(new_class['name'], new_class.get('translation'))
+        features_by_class.append(cache.get(new_class['name'], paths))
+        new_paths.append(paths)
+
+    kernel, bias = model.layers[-1].get_weights()
+    kernel, bias = imprint_weights(kernel, bias, features_by_class[old_count:])
+    (train_x, train_y), (val_x, val_y) = _split(features_by_class)
+    classifier = train_head(train_x, train_y, kernel, bias, epochs, learning_rate)
+    trained_kernel, trained_bias = classifier.get_weights()
+
+    new_model = tf.keras.Model(model.inputs, classifier(model.layers[-1].input))
+    output_model = output_model or f"final_mobilenetv2_food_incremental_{len(registry)}.keras"
+    new_model.save(output_model)
+
+    # Gambar pertama setiap kelas baru dipakai sebagai gambar galeri
+    for new_class, paths in zip(new_classes, new_paths):
+        image = os.path.join(gallery_dir, f"{new_class['name']}{os.path.splitext(paths[0])[1].lower()}")
+        shutil.copyfile(paths[0], image)
+        registry.classes[registry.index(new_class['name'])]['image'] = image
+    registry.model = output_model
+    registry.save()
+
+    old_mask, new_mask = val_y < old_count, val_y >= old_count
+    return {
+        'model': output_model,
+        'classes': len(registry),
+        'missing_train_data': missing,
+        'val_old_before': _accuracy(kernel, bias, val_x, val_y, old_mask),
+        'val_old_after': _accuracy(trained_kernel, trained_bias, val_x, val_y, old_mask),
+        'val_new_before': _accuracy(kernel, bias, val_x, val_y, new_mask),
+        'val_new_after': _accuracy(trained_kernel, trained_bias, val_x, val_y, new_mask),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+#   python incremental.py add martabak data/martabak --translation "Martabak Manis"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tambah kelas makanan baru dengan melatih head klasifikasi saja")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Daftarkan kelas baru dan latih ulang head klasifikasi")
+    add_parser.add_argument("name")
+    add_parser.add_argument("folder")
+    add_parser.add_argument("--translation")
+    add_parser.add_argument("--train-dir", default="food", help="Folder data latih kelas lama (food/<kelas>/)")
+    add_parser.add_argument("--registry", default=CLASS_REGISTRY_PATH)
+    add_parser.add_argument("--output")
+    add_parser.add_argument("--max-per-class", type=int, default=MAX_IMAGES_PER_CLASS)
+    add_parser.add_argument("--epochs", type=int, default=30, help="0 = hanya bobot prototipe, tanpa pelatihan")
+    add_parser.add_argument("--learning-rate", type=float, default=1e-3)
+    add_parser.add_argument("--cache-dir", default=FEATURE_CACHE_DIR)
+
+    args = parser.parse_args()
+    report = add_classes([{'name': args.name, 'folder': args.folder, 'translation': args.translation}],
+                         args.train_dir, args.registry, args.output, args.max_per_class, args.epochs,
+                         args.learning_rate, args.cache_dir)
+    for name, value in report.items():
+        print(f"{name}: {value}")
+    if report['missing_train_data']:
+        print(f"Peringatan: {len(report['missing_train_data'])} kelas lama tanpa data latih di {args.train_dir}; "
+              "hanya gambar galerinya yang dipakai")
+    print("Buat ulang indeks embedding agar kelas baru ikut muncul: python embedding_index.py build")
@@ -0,0 +1,160 @@
+import importlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+STARTUP_TIMINGS_PATH = os.getenv("STARTUP_TIMINGS_PATH")  # file JSON lines, kosong = tidak dicatat
+
+_STOP = object()
+
+
+# Mesin inferensi dengan micro-batching dinamis: permintaan dari banyak sesi
+# dikumpulkan ke antrean, lalu worker menggabungkannya menjadi satu batch
+# (maks. `max_batch` gambar atau menunggu maks. `max_wait_ms`) sebelum predict.
+#
+# Dengan background=True model dimuat dan di-warmup di thread terpisah sehingga
+# halaman bisa langsung dirender; permintaan yang masuk sebelum siap tetap antre.
+class InferenceEngine:
+    def __init__(self, model_loader, max_batch=INFERENCE_MAX_BATCH, max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                 num_workers=INFERENCE_WORKERS, background=False, preload_modules=(), warmup_shape=None):
+        self.model = None
+        self.ready = threading.Event()
+        self.load_error = None
+        self.timings = {}
+        if background:
+            threading.Thread(target=self._load, args=(model_loader, preload_modules, warmup_shape),
+                             name="inference-loader", daemon=True).start()
+        else:
+            self._load(model_loader, preload_modules, warmup_shape)
+            if self.load_error is not None:
+                raise self.load_error
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0}
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._run, name=f"inference-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _load(self, model_loader, preload_modules, warmup_shape):
+        start = time.perf_counter()
+        try:
+            for module in preload_modules:
+                importlib.import_module(module)
+            imported = time.perf_counter()
+            self.timings['import_s'] = imported - start
+
+            self.model = model_loader()
+            loaded = time.perf_counter()
+            self.timings['load_s'] = loaded - imported
+
+            # Panggilan pertama memicu tracing graph, jadi lakukan sekali dengan input dummy
+            if warmup_shape is not None:
+                self.model.predict_on_batch(np.zeros(warmup_shape, dtype=np.float32))
+            self.timings['warmup_s'] = time.perf_counter() - loaded
+        except Exception as e:
+            self.load_error = e
+        self.timings['total_s'] = time.perf_counter() - start
+        self.ready.set()
+        self._record_timings()
+
+    def _record_timings(self):
+        if not STARTUP_TIMINGS_PATH:
+            return
+        entry = dict(self.timings, timestamp=time.time(), ok=self.load_error is None)
+        with open(STARTUP_TIMINGS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        stats['queue_size'] = self._queue.qsize()
+        return stats
+
+    # Kirim satu gambar (H, W, 3) yang sudah dipraproses, hasilnya Future berisi vektor probabilitas
+    def submit(self, image):
+        future = Future()
+        self._queue.put((np.asarray(image, dtype=np.float32), future))
+        return future
+
+    def submit_many(self, images):
+        return [self.submit(image) for image in images]
+
+    # Versi blocking: batch (N, H, W, 3) masuk, array probabilitas (N, kelas) keluar
+    # (untuk model dengan beberapa output: tuple berisi satu array per output)
+    def predict(self, images, timeout=None):
+        futures = self.submit_many(images)
+        results = [future.result(timeout=timeout) for future in futures]
+        if results and isinstance(results[0], tuple):
+            return tuple(np.stack(output) for output in zip(*results))
+        return np.stack(results)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        self.ready.wait()
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.put(_STOP)
+                return
+            batch = self._collect_batch(first)
+            if self.load_error is not None:
+                for _, future in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(self.load_error)
+                continue
+            images, futures = [], []
+            for image, future in batch:
+                if future.set_running_or_notify_cancel():
+                    images.append(image)
+                    futures.append(future)
+            if not futures:
+                continue
+            try:
+                # predict_on_batch jauh lebih ringan daripada predict untuk batch kecil
+                outputs = self.model.predict_on_batch(np.stack(images))
+                if isinstance(outputs, (list, tuple)):
+                    # Model dengan beberapa output (probabilitas + embedding): hasil per gambar berupa tuple
+                    predictions = list(zip(*[np.asarray(output) for output in outputs]))
+                else:
+                    predictions = np.asarray(outputs)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, prediction in zip(futures, predictions):
+                future.set_result(prediction)
+            with self._stats_lock:
+                self._stats['requests'] += len(futures)
+                self._stats['batches'] += 1
+
+    def close(self):
+        self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,430 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# Alamat sidecar inferensi: path Unix socket (/tmp/food-inference.sock) atau host:port.
+# Kosong = aplikasi memuat model sendiri di dalam proses Streamlit.
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER")
+INFERENCE_SERVER_WORKERS = int(os.getenv("INFERENCE_SERVER_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_SERVER_MAX_QUEUE = int(os.getenv("INFERENCE_SERVER_MAX_QUEUE", "32"))  # permintaan antre di luar yang diproses
+INFERENCE_SERVER_TIMEOUT = float(os.getenv("INFERENCE_SERVER_TIMEOUT", "30"))  # detik
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY")  # wajib untuk host:port, opsional untuk Unix socket
+# Default worker TFLite tanpa XNNPACK supaya bobot int8 dibagi antar worker (lihat tflite_backend);
+# 1 = XNNPACK: latensi lebih rendah, tetapi setiap worker menyimpan salinan bobotnya sendiri
+INFERENCE_SERVER_XNNPACK = os.getenv("INFERENCE_SERVER_XNNPACK", "0") == "1"
+
+
+class ServerBusy(Exception):
+    pass
+
+
+def _parse_address(address):
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return (host or '127.0.0.1', int(port)), 'AF_INET'
+    return address, 'AF_UNIX'
+
+
+def _authkey():
+    return INFERENCE_AUTHKEY.encode('utf-8') if INFERENCE_AUTHKEY else None
+
+
+# Memori satu proses dari /proc (Linux) dalam MB: rss = anon (milik proses sendiri) + file
+# (halaman file yang di-mmap, dibagi dengan proses lain yang memetakan file yang sama). None di luar Linux.
+def _process_memory(pid):
+    fields = {'VmRSS': 'rss_mb', 'RssAnon': 'anon_mb', 'RssFile': 'file_mb'}
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status", encoding='utf-8') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    memory[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        return None
+    return memory
+
+
+# Header dikirim sebagai JSON dan array sebagai byte mentah (tanpa pickle) di socket maupun pipe
+def _send_json(conn, obj):
+    conn.send_bytes(json.dumps(obj).encode('utf-8'))
+
+
+def _recv_json(conn):
+    return json.loads(conn.recv_bytes())
+
+
+def _send_outputs(conn, outputs):
+    _send_json(conn, {'ok': True, 'outputs': [{'shape': list(o.shape), 'dtype': str(o.dtype)} for o in outputs]})
+    for output in outputs:
+        conn.send_bytes(np.ascontiguousarray(output))
+
+
+def _recv_outputs(conn, response):
+    return [np.frombuffer(conn.recv_bytes(), dtype=spec['dtype']).reshape(spec['shape'])
+            for spec in response['outputs']]
+
+
+# Model di proses worker. TFLite membuka file model dengan mmap, tetapi bobot hanya benar-benar
+# dibagi antar worker jika kernelnya membaca langsung dari file itu: XNNPACK mengemas ulang bobot
+# ke memori setiap worker dan model float16 didekuantisasi per worker. Karena itu sidecar default
+# tanpa XNNPACK dengan model int8, sehingga bobot tetap di page cache bersama dan memori tidak
+# tumbuh N kali lipat; imbalannya latensi per batch lebih tinggi. tflite_runtime (requirements.txt)
+# perlu terpasang, jika tidak setiap worker meng-import TensorFlow penuh. Model Keras dimuat penuh
+# di setiap worker. Pemakaian memori per worker (anon = salinan sendiri, file = bersama) dilaporkan
+# di health check untuk membandingkan kedua mode.
+def _load_worker_model(backend, threads, xnnpack=False):
+    from class_registry import load_registry
+
+    registry = load_registry()
+    if backend == 'tflite':
+        from tflite_backend import TFLITE_MODEL_PATH, TFLiteModel
+        model = TFLiteModel(TFLITE_MODEL_PATH, num_threads=threads, xnnpack=xnnpack)
+        num_classes = int(model.interpreter.get_output_details()[0]['shape'][-1])
+    elif backend == 'keras':
+        import tensorflow as tf
+        from embedding_index import with_embedding_output
+        from tflite_backend import KERAS_MODEL_PATH
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        keras_model = tf.keras.models.load_model(registry.model or KERAS_MODEL_PATH)
+        num_classes = keras_model.output_shape[-1]
+        model = with_embedding_output(keras_model)
+    else:
+        raise ValueError(f"Backend tidak dikenal: {backend}")
+    if num_classes != len(registry):
+        raise ValueError(f"Model memiliki {num_classes} kelas, sedangkan {registry.path} memiliki {len(registry)} kelas")
+    return model
+
+
+def _worker_main(conn, backend, threads, warmup_shape, xnnpack):
+    # Ctrl+C ditangani proses utama, yang kemudian menghentikan worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    start = time.perf_counter()
+    try:
+        model = _load_worker_model(backend, threads, xnnpack)
+        model.predict_on_batch(np.zeros(warmup_shape, dtype=np.float32))
+    except Exception as e:
+        _send_json(conn, {'ready': False, 'error': str(e)})
+        return
+    _send_json(conn, {'ready': True, 'pid': os.getpid(), 'load_s': time.perf_counter() - start})
+    while True:
+        try:
+            request = _recv_json(conn)
+            payload = conn.recv_bytes()
+        except EOFError:
+            return
+        try:
+            images = np.frombuffer(payload, dtype=np.float32).reshape(request['shape'])
+            outputs = model.predict_on_batch(images)
+            outputs = outputs if isinstance(outputs, (list, tuple)) else [outputs]
+            _send_outputs(conn, [np.asarray(output) for output in outputs])
+        except Exception as e:
+            _send_json(conn, {'ok': False, 'error': str(e)})
+
+
+class _Worker:
+    def __init__(self, context, slot, backend, threads, warmup_shape, xnnpack):
+        self.slot = slot
+        self.info = None
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, backend, threads, warmup_shape, xnnpack),
+                                       name=f"inference-worker-{slot}", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+
+# Sidecar inferensi: N proses worker (masing-masing satu model) di belakang satu socket lokal.
+# Setiap koneksi dilayani thread sendiri; permintaan diteruskan ke worker yang menganggur.
+# Backpressure: jika permintaan yang sedang diproses + antre melebihi workers + max_queue,
+# permintaan baru langsung ditolak dengan status busy alih-alih menunggu tanpa batas.
+class InferenceServer:
+    def __init__(self, address=INFERENCE_SERVER, workers=INFERENCE_SERVER_WORKERS, backend='tflite', threads=None,
+                 max_queue=INFERENCE_SERVER_MAX_QUEUE, queue_timeout=INFERENCE_SERVER_TIMEOUT,
+                 warmup_shape=(1, 224, 224, 3), xnnpack=INFERENCE_SERVER_XNNPACK):
+        self.address = address
+        self.num_workers = workers
+        self.backend = backend
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.warmup_shape = warmup_shape
+        self.xnnpack = xnnpack
+        self.load_error = None
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = {}
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {'requests': 0, 'rejected': 0, 'errors': 0, 'restarts': 0}
+        self._listener = None
+        self._closed = threading.Event()
+
+    def _spawn(self, slot):
+        worker = _Worker(self._context, slot, self.backend, self.threads, self.warmup_shape, self.xnnpack)
+        with self._lock:
+            self._workers[slot] = worker
+        threading.Thread(target=self._await_ready, args=(worker,), name=f"inference-ready-{slot}", daemon=True).start()
+
+    def _await_ready(self, worker):
+        try:
+            message = _recv_json(worker.conn)
+        except (EOFError, OSError) as e:
+            message = {'ready': False, 'error': f"worker berhenti saat memuat model: {e}"}
+        if message.get('ready'):
+            worker.info = message
+            self._idle.put(worker)
+        else:
+            self.load_error = message.get('error')
+
+    # Worker yang mati setelah siap dijalankan ulang; worker yang gagal memuat model tidak
+    # (kesalahannya dilaporkan di health check) supaya tidak berulang terus-menerus.
+    def _supervise(self, interval=1.0):
+        while not self._closed.wait(interval):
+            with self._lock:
+                dead = [w for w in self._workers.values() if w.info is not None and not w.process.is_alive()]
+            for worker in dead:
+                worker.conn.close()
+                with self._lock:
+                    self._stats['restarts'] += 1
+                self._spawn(worker.slot)
+
+    def health(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            stats = dict(self._stats, in_flight=self._in_flight)
+        ready = [w for w in workers if w.info is not None and w.process.is_alive()]
+        return dict(stats, ok=bool(ready), backend=self.backend, xnnpack=self.xnnpack, workers=self.num_workers,
+                    ready=len(ready), idle=self._idle.qsize(), max_queue=self.max_queue, load_error=self.load_error,
+                    pids=[w.info['pid'] for w in ready],
+                    memory=[dict(_process_memory(w.info['pid']) or {}, pid=w.info['pid']) for w in ready])
+
+    def _dispatch(self, request, payload):
+        with self._lock:
+            if self._in_flight >= self.num_workers + self.max_queue:
+                self._stats['rejected'] += 1
+                raise ServerBusy("Server inferensi penuh")
+            self._in_flight += 1
+            self._stats['requests'] += 1
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            while True:
+                try:
+                    worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise ServerBusy("Tidak ada worker yang tersedia") from None
+                if worker.process.is_alive():
+                    break
+            try:
+                _send_json(worker.conn, request)
+                worker.conn.send_bytes(payload)
+                response = _recv_json(worker.conn)
+                outputs = _recv_outputs(worker.conn, response) if response.get('ok') else []
+            except (EOFError, OSError):
+                # Worker mati di tengah permintaan; supervisor akan menjalankannya ulang
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            self._idle.put(worker)
+            if not response.get('ok'):
+                with self._lock:
+                    self._stats['errors'] += 1
+            return response, outputs
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _serve_connection(self, conn):
+        with conn:
+            try:
+                while True:
+                    request = _recv_json(conn)
+                    if request.get('op') == 'health':
+                        _send_json(conn, self.health())
+                        continue
+                    payload = conn.recv_bytes()
+                    try:
+                        response, outputs = self._dispatch(request, payload)
+                    except ServerBusy as e:
+                        _send_json(conn, {'ok': False, 'busy': True, 'error': str(e)})
+                        continue
+                    except (EOFError, OSError) as e:
+                        _send_json(conn, {'ok': False, 'error': f"worker berhenti: {e}"})
+                        continue
+                    if response.get('ok'):
+                        _send_outputs(conn, outputs)
+                    else:
+                        _send_json(conn, response)
+            except (EOFError, OSError):
+                # Klien menutup koneksi, termasuk di tengah pengiriman hasil
+                return
+
+    def start(self):
+        address, family = _parse_address(self.address)
+        # Koneksi TCP tanpa authkey bisa dipakai siapa pun yang menjangkau port-nya
+        if family == 'AF_INET' and _authkey() is None:
+            raise ValueError(f"INFERENCE_AUTHKEY wajib diisi untuk alamat host:port ({self.address})")
+        if family == 'AF_UNIX' and os.path.exists(address):
+            os.remove(address)
+        self._listener = Listener(address, family, authkey=_authkey())
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        threading.Thread(target=self._supervise, name="inference-supervisor", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    return
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.process.terminate()
+        for worker in workers:
+            worker.process.join(timeout=5)
+
+
+# Client untuk aplikasi Streamlit dengan antarmuka predict_on_batch seperti model Keras,
+# sehingga bisa langsung dipakai InferenceEngine. Koneksi dipakai ulang lewat pool;
+# saat server penuh permintaan diulang dengan backoff + jitter, lalu ServerBusy.
+class RemoteModel:
+    def __init__(self, address=INFERENCE_SERVER, timeout=INFERENCE_SERVER_TIMEOUT, busy_retries=3,
+                 backoff_base=0.05, backoff_max=1.0):
+        self.address = address
+        self.timeout = timeout
+        self.busy_retries = busy_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._pool = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        address, family = _parse_address(self.address)
+        return Client(address, family, authkey=_authkey())
+
+    # Koneksi dari pool bisa basi setelah sidecar di-restart: buang pool lalu ulangi sekali
+    # dengan koneksi baru. Koneksi baru yang gagal langsung dilaporkan.
+    def _request(self, request, payload=None):
+        with self._lock:
+            conn = self._pool.pop() if self._pool else None
+        if conn is not None:
+            try:
+                return self._exchange(conn, request, payload)
+            except (EOFError, ConnectionError):
+                self.close()
+        return self._exchange(self._connect(), request, payload)
+
+    def _exchange(self, conn, request, payload):
+        try:
+            _send_json(conn, request)
+            if payload is not None:
+                conn.send_bytes(payload)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"Server inferensi tidak menjawab dalam {self.timeout} detik")
+            response = _recv_json(conn)
+            outputs = _recv_outputs(conn, response) if response.get('outputs') else []
+        except BaseException:
+            conn.close()
+            raise
+        with self._lock:
+            self._pool.append(conn)
+        return response, outputs
+
+    def health(self):
+        return self._request({'op': 'health'})[0]
+
+    # Tunggu sampai minimal satu worker siap (dipanggil saat aplikasi memuat "model")
+    def wait_ready(self, timeout=120.0, interval=0.5):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                health = self.health()
+                if health['ok']:
+                    return self
+                if health.get('load_error'):
+                    raise RuntimeError(f"Worker inferensi gagal memuat model: {health['load_error']}")
+            except (ConnectionError, FileNotFoundError, EOFError):
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Server inferensi di {self.address} belum siap")
+            time.sleep(interval)
+
+    def predict_on_batch(self, images):
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        for attempt in range(self.busy_retries + 1):
+            response, outputs = self._request({'op': 'predict', 'shape': list(images.shape)}, images)
+            if response.get('ok'):
+                return outputs[0] if len(outputs) == 1 else outputs
+            if not response.get('busy'):
+                raise RuntimeError(response.get('error'))
+            if attempt < self.busy_retries:
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+        raise ServerBusy(response.get('error'))
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+
+
+#   python inference_server.py serve --address /tmp/food-inference.sock --workers 4
+#   python inference_server.py health --address /tmp/food-inference.sock
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sidecar inferensi multi-proses untuk aplikasi klasifikasi makanan")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Jalankan server inferensi")
+    serve_parser.add_argument("--address", default=INFERENCE_SERVER or "/tmp/food-inference.sock")
+    serve_parser.add_argument("--workers", type=int, default=INFERENCE_SERVER_WORKERS)
+    serve_parser.add_argument("--threads", type=int, help="Thread per worker (default: jumlah CPU / worker)")
+    serve_parser.add_argument("--backend", choices=["tflite", "keras"], default="tflite",
+                              help="keras memuat salinan model penuh per worker")
+    serve_parser.add_argument("--xnnpack", action="store_true", default=INFERENCE_SERVER_XNNPACK,
+                              help="TFLite dengan XNNPACK: lebih cepat, tetapi bobot disalin ke setiap worker")
+    serve_parser.add_argument("--max-queue", type=int, default=INFERENCE_SERVER_MAX_QUEUE)
+
+    health_parser = subparsers.add_parser("health", help="Periksa kesehatan server (exit code 0 jika siap)")
+    health_parser.add_argument("--address", default=INFERENCE_SERVER or "/tmp/food-inference.sock")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        server = InferenceServer(args.address, args.workers, args.backend, args.threads, args.max_queue,
+                                 xnnpack=args.xnnpack).start()
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Server inferensi ({args.backend}, {args.workers} worker) mendengarkan di {args.address}")
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.close()
+    else:
+        try:
+            health = RemoteModel(args.address, timeout=5).health()
+        except (OSError, EOFError, TimeoutError) as e:
+            print(f"Server tidak dapat dihubungi: {e}")
+            sys.exit(1)
+        print(json.dumps(health, indent=2))
+        sys.exit(0 if health['ok'] else 1)
@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from class_registry import load_registry
+from http_client import get_shared_client
+
+NUTRITION_API_URL = os.getenv("NUTRITION_API_URL", "https://api.api-ninjas.com/v1/nutrition")
+NUTRITION_DB_PATH = os.getenv("NUTRITION_DB_PATH", "nutrition_cache.db")
+NUTRITION_TTL = float(os.getenv("NUTRITION_TTL", str(7 * 24 * 3600)))  # detik
+
+
+class NutritionError(Exception):
+    pass
+
+
+# Backend API Ninjas. base_url bisa diarahkan ke server stub lokal untuk pengujian.
+class ApiNinjasBackend:
+    def __init__(self, api_key=None, base_url=NUTRITION_API_URL, timeout=None, client=None):
+        self.api_key = api_key if api_key is not None else os.getenv("NUTRITION_API_KEY")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.client = client or get_shared_client()
+
+    def fetch(self, query):
+        try:
+            response = self.client.get(
+                self.base_url,
+                params={'query': query},
+                headers={'X-Api-Key': self.api_key or ''},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise NutritionError(f"Gagal menghubungi API nutrisi: {e}") from e
+        if response.status_code != 200:
+            raise NutritionError(f"Gagal mengambil informasi nutrisi: {response.status_code}")
+        # Body 200 yang bukan JSON (misalnya halaman HTML proxy) diperlakukan sebagai kegagalan API
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise NutritionError(f"Respons API nutrisi bukan JSON yang valid: {e}") from e
+        if not isinstance(data, list):
+            raise NutritionError("Format respons API nutrisi tidak dikenal")
+        return data
+
+
+# Backend offline dari snapshot JSON: {"apple pie": [{...}], ...}
+class JsonSnapshotBackend:
+    def __init__(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.data = json.load(f)
+
+    def fetch(self, query):
+        if query not in self.data:
+            raise NutritionError(f"Tidak ada data nutrisi untuk '{query}' di snapshot")
+        return self.data[query]
+
+
+# Backend pengganti untuk pengujian/benchmark offline: data gizi tetap untuk setiap makanan
+class StubBackend:
+    def __init__(self, record=None):
+        self.record = record or {
+            'fat_total_g': 10.0, 'fat_saturated_g': 3.0, 'sodium_mg': 300.0, 'potassium_mg': 150.0,
+            'cholesterol_mg': 20.0, 'carbohydrates_total_g': 30.0, 'fiber_g': 2.0, 'sugar_g': 8.0,
+        }
+
+    def fetch(self, query):
+        return [dict(self.record, name=query)]
+
+
+def make_backend(name=None):
+    name = name or os.getenv("NUTRITION_BACKEND", "api")
+    if name == "api":
+        return ApiNinjasBackend()
+    if name == "stub":
+        return StubBackend()
+    if name.endswith(".json"):
+        return JsonSnapshotBackend(name)
+    raise ValueError(f"Backend nutrisi tidak dikenal: {name}")
+
+
+# Penyimpanan lokal (SQLite) dengan TTL + memo di memori.
+# Data kedaluwarsa tetap dipakai jika API sedang tidak bisa dihubungi.
+class NutritionStore:
+    def __init__(self, backend=None, db_path=NUTRITION_DB_PATH, ttl=NUTRITION_TTL):
+        self.backend = backend if backend is not None else make_backend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS nutrition ("
+                "query TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            for query, data, fetched_at in self._conn.execute("SELECT query, data, fetched_at FROM nutrition"):
+                self._memory[query] = (json.loads(data), fetched_at)
+
+    @staticmethod
+    def normalize(food):
+        return food.replace('_', ' ').strip().lower()
+
+    def _save(self, query, data):
+        fetched_at = time.time()
+        with self._lock:
+            self._memory[query] = (data, fetched_at)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nutrition (query, data, fetched_at) VALUES (?, ?, ?)",
+                (query, json.dumps(data), fetched_at),
+            )
+            self._conn.commit()
+
+    def refresh(self, food):
+        query = self.normalize(food)
+        data = self.backend.fetch(query)
+        self._save(query, data)
+        return data
+
+    # Mengembalikan daftar hasil API (list of dict), sama seperti response.json()
+    def lookup(self, food):
+        query = self.normalize(food)
+        cached = self._memory.get(query)
+        if cached is not None and time.time() - cached[1] < self.ttl:
+            return cached[0]
+        try:
+            return self.refresh(query)
+        except NutritionError:
+            if cached is not None:
+                return cached[0]
+            raise
+
+    # Data gizi per 100g untuk satu makanan, atau None jika API tidak punya datanya
+    def get(self, food):
+        data = self.lookup(food)
+        return data[0] if data else None
+
+    def prefetch(self, foods, max_workers=8, force=False):
+        queries = [self.normalize(food) for food in foods]
+        if not force:
+            now = time.time()
+            queries = [q for q in queries if q not in self._memory or now - self._memory[q][1] >= self.ttl]
+        failed = {}
+
+        def fetch_one(query):
+            try:
+                self.refresh(query)
+            except NutritionError as e:
+                failed[query] = str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(fetch_one, queries))
+        return len(queries) - len(failed), failed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def export(self, path):
+        with self._lock:
+            snapshot = {query: data for query, (data, fetched_at) in self._memory.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, sort_keys=True)
+
+
+# Isi cache untuk semua kelas sekaligus:
+#   python nutrition.py prefetch [--force]
+#   python nutrition.py export nutrition_snapshot.json
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "prefetch"
+    store = NutritionStore()
+    if command == "prefetch":
+        names = load_registry().names
+        ok, failed = store.prefetch(names, force="--force" in sys.argv)
+        print(f"{ok} data nutrisi diperbarui, {len(failed)} gagal")
+        for query, error in failed.items():
+            print(f"- {query}: {error}")
+        sys.exit(1 if failed else 0)
+    elif command == "export":
+        path = sys.argv[2] if len(sys.argv) > 2 else "nutrition_snapshot.json"
+        store.export(path)
+        print(f"Snapshot nutrisi disimpan di {path}")
+    else:
+        print(f"Perintah tidak dikenal: {command}")
+        sys.exit(2)
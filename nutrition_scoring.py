@@ -0,0 +1,81 @@
+import numpy as np
+
+# Urutan kolom matriks nutrisi (satuan mengikuti API Ninjas, per 100g)
+NUTRIENTS = (
+    'calories', 'fat_total_g', 'fat_saturated_g', 'sodium_mg', 'potassium_mg',
+    'cholesterol_mg', 'carbohydrates_total_g', 'fiber_g', 'sugar_g',
+)
+NUTRIENT_INDEX = {name: i for i, name in enumerate(NUTRIENTS)}
+
+# Batas sehat per 100g: asupan harian WHO/AHA dibagi 3 kali makan, lalu dibagi 2
+LIMIT_NUTRIENTS = ('fat_total_g', 'fat_saturated_g', 'sodium_mg', 'cholesterol_mg', 'sugar_g')
+LIMIT_LABELS = ('Lemak Total', 'Lemak Jenuh', 'Natrium', 'Kolesterol', 'Gula')
+LIMITS_PER_100G = np.array([11.0, 4.0, 333.0, 50.0, 8.0])
+
+# Keterangan tambahan: ambang "sangat cukup", "cukup", "hampir cukup" (nilai absolut per porsi)
+TIER_NUTRIENTS = ('fiber_g', 'carbohydrates_total_g', 'potassium_mg')
+TIER_LABELS = ('Serat', 'Karbohidrat', 'Kalium')
+TIER_NAMES = ('sangat cukup', 'cukup', 'hampir cukup')
+TIER_THRESHOLDS = np.array([
+    [8.0, 4.0, 2.0],
+    [75.0, 37.5, 18.75],
+    [1167.0, 583.0, 292.0],
+])
+
+_LIMIT_COLUMNS = np.array([NUTRIENT_INDEX[name] for name in LIMIT_NUTRIENTS])
+_TIER_COLUMNS = np.array([NUTRIENT_INDEX[name] for name in TIER_NUTRIENTS])
+
+
+def _to_float(x):
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# Daftar dict hasil API -> matriks (N, len(NUTRIENTS)); nilai kosong/non-angka jadi 0
+def to_matrix(foods):
+    return np.array([[_to_float(food.get(name)) for name in NUTRIENTS] for food in foods], dtype=np.float64).reshape(-1, len(NUTRIENTS))
+
+
+# Skor sekaligus untuk N makanan dan porsi (gram) masing-masing.
+# `grams` boleh skalar atau array dengan panjang N. Mengembalikan dict berisi array:
+#   nutrients (N, 9)  nilai gizi sesuai porsi
+#   limits    (N, 5)  batas sehat sesuai porsi
+#   exceeded  (N, 5)  True jika nilai >= batas
+#   healthy   (N,)    True jika tidak ada batas yang terlewati
+#   tiers     (N, 3)  indeks TIER_NAMES, -1 jika di bawah semua ambang
+def score_matrix(matrix, grams=100):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    factor = np.broadcast_to(np.asarray(grams, dtype=np.float64) / 100.0, (matrix.shape[0],))[:, None]
+    nutrients = matrix * factor
+    limits = LIMITS_PER_100G[None, :] * factor
+    exceeded = nutrients[:, _LIMIT_COLUMNS] >= limits
+    above = nutrients[:, _TIER_COLUMNS, None] > TIER_THRESHOLDS[None, :, :]
+    tiers = np.where(above.any(axis=2), above.argmax(axis=2), -1)
+    return {
+        'nutrients': nutrients,
+        'limits': limits,
+        'exceeded': exceeded,
+        'healthy': ~exceeded.any(axis=1),
+        'tiers': tiers,
+    }
+
+
+# Versi terstruktur dari score_matrix: satu dict verdict per makanan
+def score_foods(foods, grams=100):
+    result = score_matrix(to_matrix(foods), grams)
+    verdicts = []
+    for i in range(len(foods)):
+        verdicts.append({
+            'nutrients': dict(zip(NUTRIENTS, result['nutrients'][i].tolist())),
+            'limits': dict(zip(LIMIT_NUTRIENTS, result['limits'][i].tolist())),
+            'healthy': bool(result['healthy'][i]),
+            'reasons': [label for label, hit in zip(LIMIT_LABELS, result['exceeded'][i]) if hit],
+            'tiers': {label: (TIER_NAMES[t] if t >= 0 else None) for label, t in zip(TIER_LABELS, result['tiers'][i])},
+        })
+    return verdicts
+
+
+def score_food(food, grams=100):
+    return score_foods([food], grams)[0]
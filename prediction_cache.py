@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "512"))
+PREDICTION_CACHE_DB = os.getenv("PREDICTION_CACHE_DB")  # kosong = hanya cache di memori
+PREDICTION_TOP_K = 5
+
+
+def hash_image_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Versi model dari path + mtime + ukuran file, supaya hasil lama tidak dipakai setelah model diganti
+def model_version(model_path, backend="keras"):
+    try:
+        stat = os.stat(model_path)
+        return f"{backend}:{os.path.basename(model_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        return f"{backend}:{os.path.basename(model_path)}"
+
+
+def top_k(probabilities, k=PREDICTION_TOP_K):
+    probabilities = np.asarray(probabilities).ravel()
+    indices = np.argsort(probabilities)[::-1][:k]
+    return [(int(i), float(probabilities[i])) for i in indices]
+
+
+# Cache hasil prediksi per hash isi gambar: LRU di memori dengan batas jumlah entri,
+# ditambah tier SQLite opsional agar hasil tetap ada setelah aplikasi di-restart
+class PredictionCache:
+    def __init__(self, model_version, max_items=PREDICTION_CACHE_SIZE, db_path=PREDICTION_CACHE_DB, k=PREDICTION_TOP_K):
+        self.model_version = model_version
+        self.max_items = max_items
+        self.k = k
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self._lock:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions ("
+                    "digest TEXT NOT NULL, model_version TEXT NOT NULL, top_k TEXT NOT NULL, created_at REAL NOT NULL, "
+                    "embedding BLOB, PRIMARY KEY (digest, model_version))"
+                )
+                # Database lama belum punya kolom embedding
+                columns = [row[1] for row in self._conn.execute("PRAGMA table_info(predictions)")]
+                if 'embedding' not in columns:
+                    self._conn.execute("ALTER TABLE predictions ADD COLUMN embedding BLOB")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._memory))
+
+    def _remember(self, digest, entry):
+        self._memory[digest] = entry
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # Mengembalikan {'top_k': [(indeks kelas, probabilitas), ...], 'embedding': float16 atau None,
+    # 'model_version': ...} atau None
+    def get(self, digest):
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                self._memory.move_to_end(digest)
+            elif self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT top_k, embedding FROM predictions WHERE digest = ? AND model_version = ?",
+                    (digest, self.model_version),
+                ).fetchone()
+                if row is not None:
+                    entry = {
+                        'top_k': [tuple(item) for item in json.loads(row[0])],
+                        'embedding': np.frombuffer(row[1], dtype=np.float16) if row[1] is not None else None,
+                        'model_version': self.model_version,
+                    }
+                    self._remember(digest, entry)
+            self._stats['hits' if entry is not None else 'misses'] += 1
+            return entry
+
+    # Embedding (opsional) ikut disimpan supaya makanan serupa tetap bisa dicari tanpa predict ulang
+    def put(self, digest, probabilities, embedding=None):
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float16).ravel()
+        entry = {'top_k': top_k(probabilities, self.k), 'embedding': embedding, 'model_version': self.model_version}
+        with self._lock:
+            self._remember(digest, entry)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO predictions (digest, model_version, top_k, created_at, embedding) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (digest, self.model_version, json.dumps(entry['top_k']), time.time(),
+                     embedding.tobytes() if embedding is not None else None),
+                )
+                self._conn.commit()
+        return entry
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Decode JPEG dengan skala lebih kecil (draft mode) sebelum resize; lebih cepat untuk foto besar
+PREPROCESS_DRAFT = os.getenv("PREPROCESS_DRAFT", "0") == "1"
+# Ikut disimpan di versi cache prediksi; ubah jika normalisasi berubah
+PREPROCESSING_VERSION = "mobilenet_v2"
+
+
+# Normalisasi MobileNetV2 (sama dengan mobilenet_v2.preprocess_input saat pelatihan): [0, 255] -> [-1, 1].
+# Ditulis langsung ke `out` tanpa array float perantara.
+def normalize_into(pixels, out):
+    np.multiply(pixels, 1 / 127.5, out=out, casting='unsafe')
+    out -= 1.0
+    return out
+
+
+# Decode + resize satu gambar menjadi array uint8 (H, W, 3). Dipakai aplikasi dan pipeline tf.data
+# (data_pipeline.py) supaya pelatihan, evaluasi, dan inferensi melihat piksel yang sama.
+# `source` boleh path atau file-like (misalnya hasil st.file_uploader / BytesIO).
+def load_pixels(source, size=IMAGE_SIZE, draft=PREPROCESS_DRAFT):
+    with Image.open(source) as img:
+        if draft and img.format == 'JPEG':
+            img.draft('RGB', size)
+        img = img.convert('RGB')
+        if img.size != size:
+            # Nearest sama dengan default load_img yang dipakai saat pelatihan
+            img = img.resize(size, Image.NEAREST)
+        return np.asarray(img)
+
+
+# Decode + resize + normalisasi satu gambar langsung ke slot buffer float32 (H, W, 3)
+def decode_into(source, out, size=IMAGE_SIZE, draft=PREPROCESS_DRAFT):
+    return normalize_into(load_pixels(source, size, draft), out)
+
+
+def preprocess_image(source, size=IMAGE_SIZE, draft=PREPROCESS_DRAFT):
+    out = np.empty((size[1], size[0], 3), dtype=np.float32)
+    return decode_into(source, out, size, draft)
+
+
+# Buffer batch float32 yang dialokasikan sekali lalu dipakai ulang antar batch
+class BatchBuffer:
+    def __init__(self, capacity, size=IMAGE_SIZE):
+        self.size = size
+        self.array = np.empty((capacity, size[1], size[0], 3), dtype=np.float32)
+
+    def load(self, sources, draft=PREPROCESS_DRAFT):
+        if len(sources) > len(self.array):
+            self.array = np.empty((len(sources),) + self.array.shape[1:], dtype=np.float32)
+        for i, source in enumerate(sources):
+            decode_into(source, self.array[i], self.size, draft)
+        return self.array[:len(sources)]
+
+
+# Transformasi referensi dari notebook pelatihan: load_img -> img_to_array -> preprocess_input.
+# Sengaja tidak ada pengganti tanpa TensorFlow: paritas hanya berarti jika dibandingkan dengan Keras.
+def training_transform(path, size=IMAGE_SIZE):
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+    from tensorflow.keras.preprocessing.image import img_to_array, load_img
+
+    return preprocess_input(img_to_array(load_img(path, target_size=(size[1], size[0]))))
+
+
+# Bandingkan hasil praproses aplikasi dengan transformasi pelatihan untuk setiap gambar di folder.
+# Tanpa draft hasilnya harus identik; dengan draft hanya dilaporkan (decode skala kecil memang berbeda).
+def check_parity(folder, draft=False):
+    paths = sorted(os.path.join(root, file) for root, dirs, files in os.walk(folder)
+                   for file in files if file.lower().endswith(IMAGE_EXTENSIONS))
+    max_diff = 0.0
+    mean_diff = 0.0
+    for path in paths:
+        diff = np.abs(preprocess_image(path, draft=draft) - training_transform(path))
+        max_diff = max(max_diff, float(diff.max()))
+        mean_diff += float(diff.mean()) / max(len(paths), 1)
+    return {'images': len(paths), 'max_abs_diff': max_diff, 'mean_abs_diff': mean_diff}
+
+
+#   python preprocessing.py food_images [--draft]
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'food_images'
+    draft = "--draft" in sys.argv
+    result = check_parity(folder, draft=draft)
+    for name, value in result.items():
+        print(f"{name}: {value}")
+    sys.exit(0 if draft or result['max_abs_diff'] <= 1e-5 else 1)
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmark import _batches, corpus_paths  # noqa: E402
+from preprocessing import BatchBuffer  # noqa: E402
+
+# Tahap yang sama dengan `python benchmark.py run`, dijalankan lewat fixture pytest-benchmark:
+#   pytest tests/test_benchmark.py --benchmark-only [--benchmark-autosave / --benchmark-compare]
+CORPUS = corpus_paths(os.path.join(ROOT, 'food_images'))
+
+
+@pytest.mark.parametrize("batch_size", [1, 8, 32])
+def test_decode(benchmark, batch_size):
+    buffer = BatchBuffer(batch_size)
+    batch = _batches(CORPUS, batch_size)[0]
+    images = benchmark(buffer.load, batch)
+    assert images.shape == (batch_size, 224, 224, 3)
+
+
+def _load_model(backend):
+    if backend == 'keras':
+        from tflite_backend import KERAS_MODEL_PATH
+        if not os.path.exists(os.path.join(ROOT, KERAS_MODEL_PATH)):
+            pytest.skip(f"model {KERAS_MODEL_PATH} tidak ada")
+        tf = pytest.importorskip("tensorflow")
+        return tf.keras.models.load_model(os.path.join(ROOT, KERAS_MODEL_PATH))
+    from tflite_backend import TFLITE_MODEL_PATH
+    if not os.path.exists(os.path.join(ROOT, TFLITE_MODEL_PATH)):
+        pytest.skip(f"model {TFLITE_MODEL_PATH} tidak ada")
+    from tflite_backend import TFLiteModel
+    try:
+        return TFLiteModel(os.path.join(ROOT, TFLITE_MODEL_PATH))
+    except ImportError:
+        pytest.skip("tflite_runtime / tensorflow tidak terpasang")
+
+
+@pytest.mark.parametrize("batch_size", [1, 8])
+@pytest.mark.parametrize("backend", ["keras", "tflite"])
+def test_predict(benchmark, backend, batch_size):
+    model = _load_model(backend)
+    images = BatchBuffer(batch_size).load(_batches(CORPUS, batch_size)[0])
+    model.predict_on_batch(images)  # warmup
+    output = np.asarray(benchmark(model.predict_on_batch, images))
+    assert output.shape[0] == batch_size
+
+
+def test_search(benchmark):
+    from embedding_index import EMBEDDING_INDEX_DIR, load_index
+
+    index = load_index(os.path.join(ROOT, EMBEDDING_INDEX_DIR))
+    if index is None:
+        pytest.skip("indeks embedding belum dibuat (python embedding_index.py build)")
+    query = np.asarray(index.embeddings[0], dtype=np.float32)
+    scores, indices = benchmark(index.search, query, 5)
+    assert indices[0][0] == 0 or scores[0][0] >= 0.999
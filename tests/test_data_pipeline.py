@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from preprocessing import IMAGE_EXTENSIONS, preprocess_image
+
+FOOD_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'food_images')
+
+pytest.importorskip("tensorflow")
+
+from data_pipeline import build_datasets, write_tfrecords  # noqa: E402
+
+
+# Folder per kelas (food/<kelas>/<file>) dari beberapa gambar galeri
+@pytest.fixture
+def class_dir(tmp_path):
+    files = sorted(file for file in os.listdir(FOOD_IMAGES) if file.lower().endswith(IMAGE_EXTENSIONS))[:4]
+    for file in files:
+        folder = tmp_path / 'food' / os.path.splitext(file)[0]
+        folder.mkdir(parents=True)
+        shutil.copy(os.path.join(FOOD_IMAGES, file), folder / file)
+    return str(tmp_path / 'food')
+
+
+def _expected(directory):
+    return [preprocess_image(os.path.join(directory, name, file))
+            for name in sorted(os.listdir(directory)) for file in sorted(os.listdir(os.path.join(directory, name)))]
+
+
+# Data evaluasi tf.data (dari file maupun TFRecord) harus identik dengan praproses aplikasi
+@pytest.mark.parametrize("source", ["files", "tfrecords"])
+def test_eval_split_matches_app_preprocessing(class_dir, tmp_path, source):
+    tfrecord_dir = write_tfrecords(class_dir, str(tmp_path / 'tfrecords'), test_dir=class_dir,
+                                   validation_split=0.0, num_shards=1) if source == "tfrecords" else None
+    datasets = build_datasets(class_dir, test_dir=class_dir, validation_split=0.0, augment=False,
+                              tfrecord_dir=tfrecord_dir)
+    images = np.concatenate([batch for batch, _ in datasets['test']])
+    np.testing.assert_allclose(images, np.stack(_expected(class_dir)), atol=1e-5)
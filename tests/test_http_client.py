@@ -0,0 +1,111 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient
+
+
+# Server HTTP lokal yang menjawab dengan status dari `statuses` secara berurutan
+# (status terakhir diulang) dan menghitung permintaan yang masuk
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with state['lock']:
+                state['hits'] += 1
+                statuses = state['statuses']
+                status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            body = b'[]'
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    state = {'statuses': [200], 'hits': 0, 'lock': threading.Lock(),
+             'url': f"http://127.0.0.1:{httpd.server_address[1]}/"}
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _client(**kwargs):
+    options = dict(timeout=5, max_retries=2, backoff_base=0.01, backoff_max=0.05)
+    options.update(kwargs)
+    return HttpClient(**options)
+
+
+def test_retries_until_success(server):
+    server['statuses'] = [503, 500, 200]
+    client = _client()
+    assert client.get(server['url']).status_code == 200
+    assert server['hits'] == 3
+    stats = client.stats()
+    assert stats['retries'] == 2 and stats['errors'] == 2 and stats['circuit'] == "closed"
+
+
+def test_returns_last_response_after_retries(server):
+    server['statuses'] = [503]
+    client = _client()
+    assert client.get(server['url']).status_code == 503
+    assert server['hits'] == 3
+
+
+def test_backoff_grows_exponentially_and_is_capped(server, monkeypatch):
+    server['statuses'] = [503]
+    sleeps = []
+    # Jitter diganti batas atasnya supaya urutan backoff bisa diperiksa
+    monkeypatch.setattr(http_client.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    _client(max_retries=4, backoff_base=0.01, backoff_max=0.03).get(server['url'])
+    assert sleeps == pytest.approx([0.01, 0.02, 0.03, 0.03])
+
+
+def test_breaker_counts_one_failure_per_call(server):
+    server['statuses'] = [503]
+    client = _client(breaker=CircuitBreaker(threshold=2, cooldown=60))
+    client.get(server['url'])
+    assert client.breaker.failures == 1 and client.breaker.state == "closed"
+    client.get(server['url'])
+    assert client.breaker.state == "open"
+    hits = server['hits']
+    with pytest.raises(CircuitOpenError):
+        client.get(server['url'])
+    assert server['hits'] == hits
+
+
+def test_breaker_half_open_trial(server):
+    server['statuses'] = [503]
+    client = _client(max_retries=0, breaker=CircuitBreaker(threshold=1, cooldown=0.1))
+    client.get(server['url'])
+    assert client.breaker.state == "open"
+
+    # Percobaan half-open yang gagal membuka circuit lagi
+    time.sleep(0.15)
+    assert client.breaker.state == "half-open"
+    client.get(server['url'])
+    assert client.breaker.state == "open"
+
+    # Percobaan yang berhasil menutup circuit
+    time.sleep(0.15)
+    server['statuses'] = [200]
+    assert client.get(server['url']).status_code == 200
+    assert client.breaker.state == "closed"
+
+
+def test_half_open_trial_may_retry(server):
+    server['statuses'] = [503]
+    client = _client(breaker=CircuitBreaker(threshold=1, cooldown=0.1))
+    client.get(server['url'])
+    time.sleep(0.15)
+    server['statuses'] = [503, 200]
+    assert client.get(server['url']).status_code == 200
+    assert client.breaker.state == "closed"
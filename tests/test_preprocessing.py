@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+import pytest
+
+from preprocessing import IMAGE_EXTENSIONS, IMAGE_SIZE, preprocess_image
+
+FOOD_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'food_images')
+
+
+def _image_paths():
+    return sorted(os.path.join(FOOD_IMAGES, file) for file in os.listdir(FOOD_IMAGES)
+                  if file.lower().endswith(IMAGE_EXTENSIONS))
+
+
+# Praproses aplikasi harus identik dengan transformasi pelatihan di notebook
+@pytest.mark.parametrize("path", _image_paths(), ids=os.path.basename)
+def test_preprocess_matches_training_transform(path):
+    pytest.importorskip("tensorflow")
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+    from tensorflow.keras.preprocessing.image import img_to_array, load_img
+
+    expected = preprocess_input(img_to_array(load_img(path, target_size=(IMAGE_SIZE[1], IMAGE_SIZE[0]))))
+    np.testing.assert_allclose(preprocess_image(path), expected, atol=1e-5)
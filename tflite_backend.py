@@ -0,0 +1,204 @@
+import argparse
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from preprocessing import IMAGE_EXTENSIONS, IMAGE_SIZE, BatchBuffer, preprocess_image
+
+KERAS_MODEL_PATH = 'final_mobilenetv2_food_finetune_100.keras'
+TFLITE_MODEL_PATH = os.getenv("TFLITE_MODEL_PATH", 'final_mobilenetv2_food_finetune_100_int8.tflite')
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", str(os.cpu_count() or 1)))
+
+
+# Praproses yang sama dengan aplikasi dan pelatihan (lihat preprocessing.py)
+def load_image(path, size=IMAGE_SIZE):
+    return preprocess_image(path, size)
+
+
+# Daftar (path, indeks kelas). Tanpa class_names urutan kelas seperti flow_from_directory;
+# dengan class_names (urutan output model di classes.json) folder lain diabaikan.
+def list_labeled_images(directory, class_names=None):
+    class_dirs = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    if class_names is not None:
+        class_dirs = [d for d in class_names if d in class_dirs]
+    samples = []
+    for class_dir in class_dirs:
+        index = class_names.index(class_dir) if class_names is not None else class_dirs.index(class_dir)
+        folder = os.path.join(directory, class_dir)
+        for file in sorted(os.listdir(folder)):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(folder, file), index))
+    return samples
+
+
+def representative_dataset(calib_dir, num_samples=200, seed=0):
+    samples = list_labeled_images(calib_dir)
+    random.Random(seed).shuffle(samples)
+
+    def generator():
+        for path, _ in samples[:num_samples]:
+            yield [load_image(path)[np.newaxis, ...]]
+    return generator
+
+
+# Konversi model Keras ke TFLite. quantization: "none", "float16", atau "int8"
+# (int8 dikalibrasi dengan sampel gambar dari direktori latih `food/`).
+def convert(keras_path=KERAS_MODEL_PATH, output_path=None, quantization="int8", calib_dir='food', calib_samples=200):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calib_dir, calib_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != "none":
+        raise ValueError(f"Jenis kuantisasi tidak dikenal: {quantization}")
+
+    tflite_model = converter.convert()
+    if output_path is None:
+        suffix = "" if quantization == "none" else f"_{quantization}"
+        output_path = f"{os.path.splitext(keras_path)[0]}{suffix}.tflite"
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    return output_path
+
+
+# xnnpack=False memakai kernel bawaan TFLite tanpa delegate XNNPACK. XNNPACK lebih cepat, tetapi
+# menyalin dan mengemas ulang bobot ke memori proses; kernel bawaan membaca bobot langsung dari
+# file model yang di-mmap, sehingga beberapa proses berbagi satu salinan lewat page cache.
+def _make_interpreter(model_path, num_threads, xnnpack=True):
+    # tflite_runtime jauh lebih ringan dari TensorFlow penuh; pakai jika terpasang
+    try:
+        from tflite_runtime.interpreter import Interpreter, OpResolverType
+    except ImportError:
+        from tensorflow.lite import Interpreter
+        from tensorflow.lite.experimental import OpResolverType
+    if xnnpack:
+        return Interpreter(model_path=model_path, num_threads=num_threads)
+    return Interpreter(model_path=model_path, num_threads=num_threads,
+                       experimental_op_resolver_type=OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+
+
+# Pembungkus interpreter TFLite dengan antarmuka predict/predict_on_batch seperti model Keras,
+# sehingga bisa langsung dipakai oleh InferenceEngine
+class TFLiteModel:
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=TFLITE_THREADS, xnnpack=True):
+        self.model_path = model_path
+        self.interpreter = _make_interpreter(model_path, num_threads, xnnpack)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # Interpreter tidak thread-safe, jadi satu panggilan invoke dalam satu waktu
+        self._lock = threading.Lock()
+
+    def _quantize(self, x, detail):
+        scale, zero_point = detail['quantization']
+        if detail['dtype'] == np.float32 or scale == 0:
+            return x.astype(detail['dtype'])
+        return np.round(x / scale + zero_point).astype(detail['dtype'])
+
+    def _dequantize(self, y, detail):
+        scale, zero_point = detail['quantization']
+        if detail['dtype'] == np.float32 or scale == 0:
+            return y.astype(np.float32)
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def predict_on_batch(self, images):
+        images = np.asarray(images, dtype=np.float32)
+        with self._lock:
+            return self._invoke(images)
+
+    def _invoke(self, images):
+        if images.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input['index'], images.shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = images.shape[0]
+        self.interpreter.set_tensor(self._input['index'], self._quantize(images, self._input))
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self._output['index']), self._output)
+
+    def predict(self, images, batch_size=32, verbose=0):
+        images = np.asarray(images, dtype=np.float32)
+        return np.concatenate([self.predict_on_batch(images[i:i + batch_size])
+                               for i in range(0, len(images), batch_size)])
+
+
+def _evaluate(model, samples, batch_size=32):
+    correct = 0
+    predictions = []
+    elapsed = 0.0
+    buffer = BatchBuffer(batch_size)
+    for i in range(0, len(samples), batch_size):
+        chunk = samples[i:i + batch_size]
+        images = buffer.load([path for path, _ in chunk])
+        start = time.perf_counter()
+        output = np.asarray(model.predict_on_batch(images))
+        elapsed += time.perf_counter() - start
+        predicted = np.argmax(output, axis=1)
+        predictions.append(predicted)
+        correct += int(np.sum(predicted == np.array([label for _, label in chunk])))
+    return correct / len(samples), np.concatenate(predictions), elapsed
+
+
+# Bandingkan akurasi top-1 model TFLite dengan model Keras pada `foodtest/`
+def check_parity(tflite_path, keras_path=KERAS_MODEL_PATH, test_dir='foodtest', limit=None,
+                 num_threads=TFLITE_THREADS, max_drop=0.01):
+    import tensorflow as tf
+
+    from class_registry import load_registry
+
+    samples = list_labeled_images(test_dir, load_registry().names)
+    if limit:
+        samples = random.Random(0).sample(samples, min(limit, len(samples)))
+    keras_acc, keras_pred, keras_time = _evaluate(tf.keras.models.load_model(keras_path), samples)
+    tflite_acc, tflite_pred, tflite_time = _evaluate(TFLiteModel(tflite_path, num_threads), samples)
+    result = {
+        'samples': len(samples),
+        'keras_top1': keras_acc,
+        'tflite_top1': tflite_acc,
+        'agreement': float(np.mean(keras_pred == tflite_pred)),
+        'keras_ms_per_image': keras_time / len(samples) * 1000,
+        'tflite_ms_per_image': tflite_time / len(samples) * 1000,
+    }
+    result['passed'] = keras_acc - tflite_acc <= max_drop
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Konversi dan uji model TFLite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Ekspor model Keras ke TFLite")
+    convert_parser.add_argument("--keras", default=KERAS_MODEL_PATH)
+    convert_parser.add_argument("--output")
+    convert_parser.add_argument("--quantization", choices=["none", "float16", "int8"], default="int8")
+    convert_parser.add_argument("--calib-dir", default="food")
+    convert_parser.add_argument("--calib-samples", type=int, default=200)
+
+    parity_parser = subparsers.add_parser("parity", help="Bandingkan akurasi TFLite dengan Keras pada foodtest/")
+    parity_parser.add_argument("tflite")
+    parity_parser.add_argument("--keras", default=KERAS_MODEL_PATH)
+    parity_parser.add_argument("--test-dir", default="foodtest")
+    parity_parser.add_argument("--limit", type=int)
+    parity_parser.add_argument("--threads", type=int, default=TFLITE_THREADS)
+    parity_parser.add_argument("--max-drop", type=float, default=0.01)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        path = convert(args.keras, args.output, args.quantization, args.calib_dir, args.calib_samples)
+        print(f"Model TFLite disimpan di {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    else:
+        result = check_parity(args.tflite, args.keras, args.test_dir, args.limit, args.threads, args.max_drop)
+        for name, value in result.items():
+            print(f"{name}: {value}")
+        raise SystemExit(0 if result['passed'] else 1)
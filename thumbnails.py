@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", ".thumbnail_cache")
+THUMBNAIL_SIZE = (300, 300)
+
+
+# Kunci cache: path + mtime + ukuran file + ukuran target, jadi gambar yang
+# diganti otomatis mendapat thumbnail baru
+def thumbnail_key(image_path, size=THUMBNAIL_SIZE):
+    stat = os.stat(image_path)
+    raw = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# Decode + resize satu gambar lalu encode ulang ke JPEG siap kirim
+def build_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    with Image.open(image_path) as img:
+        img = img.convert("RGB").resize(size, Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE, max_items=256, max_workers=None):
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.max_items = max_items
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _load_or_build(self, image_path, key):
+        disk_path = self._disk_path(key)
+        if os.path.exists(disk_path):
+            with open(disk_path, "rb") as f:
+                data = f.read()
+        else:
+            data = build_thumbnail(image_path, self.size)
+            # Tulis ke file sementara lalu rename supaya tidak ada file setengah jadi
+            tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+        self._remember(key, data)
+        return data
+
+    def get(self, image_path):
+        key = thumbnail_key(image_path, self.size)
+        data = self._from_memory(key)
+        if data is None:
+            data = self._load_or_build(image_path, key)
+        return data
+
+    def get_many(self, image_paths):
+        keys = [thumbnail_key(path, self.size) for path in image_paths]
+        results = [self._from_memory(key) for key in keys]
+        missing = [i for i, data in enumerate(results) if data is None]
+
+        # Cold start: decode gambar yang belum ada secara paralel
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                built = executor.map(lambda i: self._load_or_build(image_paths[i], keys[i]), missing)
+                for i, data in zip(missing, built):
+                    results[i] = data
+        return results
+
+
+# Bangun semua thumbnail sekali di muka, misalnya saat build container:
+#   python thumbnails.py food_images
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else "food_images"
+    paths = sorted(
+        os.path.join(root, file)
+        for root, dirs, files in os.walk(folder)
+        for file in files
+        if file.lower().endswith((".png", ".jpg", ".jpeg"))
+    )
+    cache = ThumbnailCache(max_items=len(paths) or 1)
+    cache.get_many(paths)
+    print(f"{len(paths)} thumbnail tersimpan di {cache.cache_dir}")
@@ -0,0 +1,186 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PATH = os.getenv("METRICS_PATH")  # file teks format Prometheus, kosong = tidak ditulis
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # port endpoint /metrics, 0 = nonaktif
+
+# Batas bucket histogram (detik)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    # Perkiraan kuantil dari bucket (batas atas bucket tempat kuantil jatuh)
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+# Kumpulan span untuk satu permintaan (satu unggahan / satu pertanyaan chatbot).
+# Span bisa bertumpuk (misalnya gemini_first_token di dalam gemini), jadi total diambil dari
+# waktu mulai-selesai trace, bukan jumlah span; span hanya rincian.
+class Trace:
+    def __init__(self, flow):
+        self.flow = flow
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._end = None
+        self.spans = []
+
+    def finish(self):
+        self._end = time.perf_counter()
+
+    @property
+    def total_s(self):
+        return (self._end if self._end is not None else time.perf_counter()) - self._start
+
+
+class Tracer:
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_traces=20):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.recent_traces = deque(maxlen=keep_traces)
+
+    def observe(self, stage, flow, seconds, status="ok"):
+        key = (stage, flow, status)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    # Catat durasi yang diukur sendiri ke histogram dan trace yang sedang aktif
+    def record(self, stage, seconds, status="ok", flow=None):
+        trace = _current_trace.get()
+        flow = flow or (trace.flow if trace is not None else "other")
+        self.observe(stage, flow, seconds, status)
+        if trace is not None:
+            trace.spans.append((stage, seconds, status))
+
+    # with tracer.span("predict"): ...
+    @contextmanager
+    def span(self, stage, flow=None):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, status, flow)
+
+    @contextmanager
+    def trace(self, flow):
+        trace = Trace(flow)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            trace.finish()
+            _current_trace.reset(token)
+            self.recent_traces.append(trace)
+            if METRICS_PATH:
+                self.write_prometheus(METRICS_PATH)
+
+    def summary(self):
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [{
+                'stage': stage,
+                'flow': flow,
+                'status': status,
+                'count': h.count,
+                'avg_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                'p50_ms': h.quantile(0.5) * 1000,
+                'p95_ms': h.quantile(0.95) * 1000,
+            } for (stage, flow, status), h in items]
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP stage_duration_seconds Durasi setiap tahap permintaan",
+            "# TYPE stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, flow, status), h in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",flow="{flow}",status="{status}"'
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'stage_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'stage_duration_seconds_sum{{{labels}}} {h.sum}')
+                lines.append(f'stage_duration_seconds_count{{{labels}}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    # Nama file sementara per proses/thread: trace yang selesai bersamaan tidak saling menimpa
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+def start_metrics_server(tracer, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = tracer.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+# Satu tracer per proses; endpoint /metrics ikut dijalankan jika METRICS_PORT diisi
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            if METRICS_PORT:
+                start_metrics_server(_tracer, METRICS_PORT)
+        return _tracer